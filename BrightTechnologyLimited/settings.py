@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +46,7 @@ STATIC_URL = '/static/'
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'SalesOrders.middleware.PerformanceMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -84,9 +86,64 @@ DATABASES = {
         'PASSWORD': '1974',
         'HOST': 'localhost',       # Or your DB host
         'PORT': '5432',            # Default PostgreSQL port
+        # Keep connections open between requests (seconds); health checks
+        # replace a connection that died while idle before it is reused.
+        # Not by default under ASGI (asgi.py sets SALESORDERS_ASYNC_VIEWS):
+        # every request's sync work gets a thread and a connection of its own,
+        # so kept connections would pile up. Use the pool below there instead.
+        'CONN_MAX_AGE': int(os.environ.get(
+            'DB_CONN_MAX_AGE', 0 if os.environ.get('SALESORDERS_ASYNC_VIEWS') == '1' else 60
+        )),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Or use a psycopg connection pool per process (needs `pip install "psycopg[pool]"`):
+#   DB_POOL_MAX_SIZE=10 DB_POOL_MIN_SIZE=2
+# Pooled connections are returned to the pool after each request, so
+# CONN_MAX_AGE must be 0.
+if os.environ.get('DB_POOL_MAX_SIZE'):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ['DB_POOL_MAX_SIZE']),
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        },
+    }
+
+# Read replica for heavy read-only paths (exports, PDFs, API, dashboard),
+# e.g. DB_REPLICA_HOST=replica.internal. Reads fall back to the primary when it
+# is not configured or cannot be reached. Tests use the primary in its place.
+if os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['DB_REPLICA_HOST'],
+        'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Use a local SQLite file instead, e.g. for benchmarks:
+#   SQLITE_PATH=bench.sqlite3 python manage.py migrate
+# SQLITE_REPLICA_PATH adds a second alias standing in for the read replica
+# (it may be the same file).
+if os.environ.get('SQLITE_PATH'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ['SQLITE_PATH'],
+        },
+    }
+    if os.environ.get('SQLITE_REPLICA_PATH'):
+        DATABASES['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ['SQLITE_REPLICA_PATH'],
+            'TEST': {'MIRROR': 'default'},
+        }
+
+DATABASE_ROUTERS = ['SalesOrders.routers.ReadReplicaRouter']
+SALESORDERS_READ_REPLICA = 'replica'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -129,5 +186,70 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-import os
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')  # or any folder name you prefer
+
+# Uploaded import files are stored here until the import worker picks them up
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Caches
+# Rendered order PDFs are kept in their own size-bounded cache (least recently
+# used entries are evicted first). Point it at a shared backend such as
+# FileBasedCache or Redis to share PDFs between worker processes.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Shared by every process on the host, including the import worker.
+    'pages': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('PAGE_CACHE_DIR', str(BASE_DIR / 'cache' / 'pages')),
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+    'pdf': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'salesorder-pdfs',
+        'TIMEOUT': 7 * 24 * 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 500},
+    },
+}
+SALESORDERS_PDF_CACHE = 'pdf'
+# The home page and orders list are cached here under keys that include a data
+# version, bumped whenever orders or lines change. The cache must be shared by
+# every web process and by run_import_worker, or a bump made after an import
+# never reaches the web processes: keep it on FileBasedCache, or use Redis when
+# the web servers run on several hosts.
+SALESORDERS_PAGE_CACHE = 'pages'
+SALESORDERS_PAGE_CACHE_TIMEOUT = 300
+
+# run_import_worker fails jobs that were left running longer than this (seconds)
+# by a worker that died, instead of leaving them running forever.
+SALESORDERS_IMPORT_JOB_TIMEOUT = 60 * 60
+
+# The sales order changelist shows the planner's row estimate instead of an
+# exact COUNT(*) once a result is estimated to be larger than this (PostgreSQL only).
+SALESORDERS_ESTIMATED_COUNT_THRESHOLD = 100000
+
+# Request timing (SalesOrders.middleware.PerformanceMiddleware)
+# Statements repeated this many times in one request are reported as likely N+1 queries.
+SALESORDERS_DUPLICATE_QUERY_THRESHOLD = 5
+# Sample stacks and log the hottest ones for requests slower than this (milliseconds); None turns it off.
+SALESORDERS_PROFILE_THRESHOLD_MS = None
+
+# Async views (SalesOrders.executors), switched on by asgi.py. Under ASGI the
+# exports, PDFs, orders list and API stream through the async ORM; workbook
+# writing and PDF rendering run in a pool of this many threads.
+SALESORDERS_ASYNC_VIEWS = os.environ.get('SALESORDERS_ASYNC_VIEWS') == '1'
+SALESORDERS_BLOCKING_WORKERS = int(os.environ.get('SALESORDERS_BLOCKING_WORKERS', 4))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # One JSON line per request and per import job
+        'SalesOrders.performance': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
@@ -1,211 +1,356 @@
+import datetime
+
+from asgiref.sync import sync_to_async
 from django.contrib import admin
-from django.urls import path
-from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse
-from django.template.loader import get_template
-from xhtml2pdf import pisa
-from io import BytesIO
-import openpyxl
-from openpyxl.utils import get_column_letter
-import csv
-
-from .models import SalesOrder, SalesOrderLines
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.admin.views.main import ChangeList
+from django.forms.models import BaseInlineFormSet
+from django.db.models import Q
+from django.urls import path, reverse
+from django.shortcuts import aget_object_or_404, render, redirect, get_object_or_404
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.cache import never_cache
+from zipfile import ZIP_STORED
+
+from .models import ImportJob, SalesOrder, SalesOrderLines, SalesRollup
 from .forms import SalesOrderImportForm
+from .autocomplete import suggest_orders
+from .executors import async_views_enabled, run_blocking, stream_async
+from .exporter import aexport_response, export_response, zip_chunks
+from .pagination import EstimatedCountPaginator
+from .pdf import get_order_pdf, order_fingerprint, pdf_filename, render_order_pdfs
+from .readers import SpreadsheetError, SpreadsheetSource, upload_hash
+from .routers import read_replica, stream_from_replica
+from .search import search_orders
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.utils.html import format_html
 
 admin.site.site_header = "Bright Technology Limited Admin Panel"
 admin.site.site_title = "Bright Technology Admin"
 admin.site.index_title = "Welcome to Bright Technology Admin"
 
+# Columns read by SalesOrderAdmin.list_display; addresses and comments are never loaded.
+CHANGELIST_FIELDS = [
+    "order_reference", "customer", "salesperson", "status", "creation_date", "currency", "total",
+    "line_count", "lines_margin",
+]
+
+
+class ExportError(Exception):
+    pass
+
+
+class RollupValueFilter(admin.SimpleListFilter):
+    """
+    Filter on one order column, listing the values found in the sales rollups.
+
+    SalesRollup is keyed on salesperson, currency and status, so it holds a
+    few rows per month whatever the number of orders, and building the
+    choices never scans the orders table the way a plain ``list_filter`` on
+    the column would.
+    """
+
+    def lookups(self, request, model_admin):
+        values = SalesRollup.objects.order_by(self.parameter_name).values_list(self.parameter_name, flat=True)
+        return [(value, value) for value in values.distinct()]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.parameter_name: self.value()})
+        return queryset
+
+
+class StatusFilter(RollupValueFilter):
+    title = "status"
+    parameter_name = "status"
+
+
+class SalespersonFilter(RollupValueFilter):
+    title = "sales person"
+    parameter_name = "salesperson"
+
+
+class SalesOrderChangeList(ChangeList):
+    def get_results(self, request):
+        # Actions and exports call get_queryset() again, so they still get full rows.
+        self.queryset = self.queryset.only(*CHANGELIST_FIELDS)
+        super().get_results(request)
+
+
+class PagedLinesFormSet(BaseInlineFormSet):
+    """
+    Inline formset holding one page of an order's lines.
+
+    Unbound, it loads ``per_page`` lines at offset ``(page - 1) * per_page``.
+    Bound, it loads exactly the lines whose ids were posted, so saving a page
+    still updates the right rows if other lines were added or deleted in the
+    meantime. The page count comes from the order's stored ``line_count``,
+    so no COUNT query is needed.
+    """
+
+    per_page = 50
+    page = 1
+
+    def get_queryset(self):
+        if not hasattr(self, "_queryset"):
+            lines = super().get_queryset()
+            if self.is_bound:
+                posted = (self.data.get(f"{self.add_prefix(i)}-id") for i in range(self.initial_form_count()))
+                lines = lines.filter(pk__in=[pk for pk in posted if pk])
+            else:
+                start = (self.page - 1) * self.per_page
+                lines = lines[start:start + self.per_page]
+            lines = list(lines)
+            for line in lines:
+                # Saves a query per row when the line's __str__ shows its order.
+                setattr(line, self.fk.name, self.instance)
+            self._queryset = lines
+        return self._queryset
+
+    @property
+    def num_pages(self):
+        line_count = self.instance.line_count if self.instance.pk else 0
+        return max(1, -(-line_count // self.per_page))
+
+    def page_range(self):
+        return range(1, self.num_pages + 1)
+
 
 class SalesOrderLinesInline(admin.TabularInline):
     model = SalesOrderLines
     extra = 1
+    formset = PagedLinesFormSet
+    readonly_fields = ["margin", "margin_percentage"]
+    template = "admin/SalesOrders/salesorder/paged_tabular.html"
+    page_param = "lines_page"
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        try:
+            page = max(1, int(request.GET.get(self.page_param, 1)))
+        except ValueError:
+            page = 1
+        return type(formset.__name__, (formset,), {"page": page, "page_param": self.page_param})
 
 
 @admin.register(SalesOrder)
 class SalesOrderAdmin(admin.ModelAdmin):
-    list_display = ("order_reference", "customer", "salesperson", "status_badge", "creation_date", "currency", "total")
+    list_display = (
+        "order_reference", "customer", "salesperson", "status_badge", "creation_date", "currency", "total",
+        "line_count", "lines_margin",
+    )
+    list_filter = [StatusFilter, SalespersonFilter, ("creation_date", admin.DateFieldListFilter)]
+    # Matches the (creation_date, order_reference) index, so pages need no sort.
+    ordering = ["-creation_date", "-order_reference"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     change_list_template = "admin/salesorder_changelist.html"
     inlines = [SalesOrderLinesInline]
+    # Maintained from the lines in SQL, shown read-only in the order header
+    readonly_fields = ["line_count", "lines_revenue", "lines_cost", "lines_margin"]
     search_fields = ["order_reference", "customer", "salesperson", "status", "creation_date", "currency", "total"]
+    actions = ["export_selected_xlsx", "export_selected_zip", "export_selected_pdfs"]
+
+    def get_changelist(self, request, **kwargs):
+        return SalesOrderChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        if request.resolver_match and request.resolver_match.url_name == "autocomplete":
+            # Order line forms look orders up on every keystroke: use the
+            # cached prefix lookup instead of the full search.
+            pks = suggest_orders(search_term)
+            return queryset.filter(pk__in=pks).order_by("-creation_date", "-order_reference"), False
+        # Typed, index-backed search instead of icontains over every search field
+        return search_orders(queryset, search_term), False
 
     def get_urls(self):
         urls = super().get_urls()
         custom_urls = [
             path("import-orders/", self.admin_site.admin_view(self.import_orders), name="SalesOrders_salesorder_import_orders"),
-            path("export-orders/", self.admin_site.admin_view(self.export_orders), name="SalesOrders_salesorder_export_orders"),
-            path("<path:object_id>/print-pdf/", self.admin_site.admin_view(self.print_pdf_view), name="SalesOrders_salesorder_print_pdf"),
+            path("export-orders/", self.download_view(self.export_orders, self.export_orders_async), name="SalesOrders_salesorder_export_orders"),
+            path("<path:object_id>/print-pdf/", self.download_view(self.print_pdf_view, self.print_pdf_view_async), name="SalesOrders_salesorder_print_pdf"),
         ]
         return custom_urls + urls
 
+    def download_view(self, view, async_view):
+        """
+        The async version of a download view when served over ASGI, else the sync one.
+
+        ``admin_view`` cannot wrap async views, so those get the same staff
+        check and never-cache headers from the decorators that support them.
+        """
+        if async_views_enabled():
+            return never_cache(staff_member_required(async_view, login_url="admin:login"))
+        return self.admin_site.admin_view(view)
+
     def import_orders(self, request):
         form = SalesOrderImportForm()
 
         if request.method == "POST":
             form = SalesOrderImportForm(request.POST, request.FILES)
-            if form.is_valid():
-                file = form.cleaned_data["file"]
+            if not form.is_valid():
+                return render(request, "admin/salesorder_import.html", {"form": form})
+            file = form.cleaned_data["file"]
+            lines_file = form.cleaned_data.get("lines_file")
 
-            # Try to load the Excel file safely
+            # Check the upload can be read before queueing it
             try:
-                wb = openpyxl.load_workbook(file, data_only=True)
-            except Exception as e:
-                self.message_user(request, f"❌ Failed to open Excel file: {e}", level="error")
-                return redirect("..")  # ✅ Moved inside the exception only
+                SpreadsheetSource(file, lines_file).close()
+            except SpreadsheetError as e:
+                self.message_user(request, f"❌ {e}", level="error")
+                return redirect("..")
 
-            # Ensure workbook has at least two sheets
-            if len(wb.sheetnames) < 2:
+            file_hash = upload_hash(file, lines_file)
+            last_import = ImportJob.objects.filter(status=ImportJob.DONE).order_by("-created_at").first()
+            if last_import and last_import.file_hash == file_hash and not form.cleaned_data["force"]:
                 self.message_user(
                     request,
-                    "❌ Your Excel file must have at least two sheets: one for Sales Orders and one for Order Lines.",
-                    level="error"
+                    f"ℹ️ This file is identical to Import #{last_import.pk}, the last one imported. Nothing to do.",
+                    level="warning"
                 )
                 return redirect("..")
 
-            sales_orders_sheet = wb.worksheets[0]
-            order_lines_sheet = wb.worksheets[1]
-
-            # --- Import Sales Orders ---
-            sales_order_count = 0
-            for i, row in enumerate(sales_orders_sheet.iter_rows(min_row=2, values_only=True), start=2):
-                if not any(row):
-                    continue
-                try:
-                    order_data = {
-                        "creation_date": row[0],
-                        "customer": row[1],
-                        "currency": row[2],
-                        "order_reference": row[3],
-                        "salesperson": row[4],
-                        "status": row[5],
-                        "total": row[6],
-                        "primary_contact": row[7],
-                        "finance_contact": row[8],
-                        "delivery_address": row[9],
-                        "invoice_address": row[10],
-                        "email_address": row[11],
-                        "delivery_date": row[12],
-                        "delivery_office_location": row[13],
-                        "tell_no": row[14],
-                        "designation": row[15],
-                        "department": row[16],
-                        "lpo_confirmation_date": row[17],
-                        "lpo_date": row[18],
-                        "lpo_number": row[19],
-                        "comments": row[20],
-                    }
-                    SalesOrder.objects.update_or_create(
-                        order_reference=order_data["order_reference"], defaults=order_data
-                    )
-                    sales_order_count += 1
-                except Exception as e:
-                    self.message_user(request, f"⚠️ Row {i} in Sales Orders sheet skipped: {e}", level="warning")
-
-            # --- Import Sales Order Lines ---
-            order_line_count = 0
-            for j, row in enumerate(order_lines_sheet.iter_rows(min_row=2, values_only=True), start=2):
-                if not any(row):
-                    continue
-                try:
-                    order = SalesOrder.objects.get(order_reference=row[0])
-                except SalesOrder.DoesNotExist:
-                    self.message_user(
-                        request,
-                        f"⚠️ Row {j} skipped: SalesOrder '{row[0]}' not found.",
-                        level="warning"
-                    )
-                    continue
-
-                try:
-                    SalesOrderLines.objects.create(
-                        order_reference=order,
-                        product=row[1],
-                        quantity=row[2],
-                        unit_price=row[3],
-                        cost=row[4],
-                        margin=row[5],
-                        margin_percentage=row[6],
-                    )
-                    order_line_count += 1
-                except Exception as e:
-                    self.message_user(
-                        request,
-                        f"⚠️ Row {j} in Order Lines sheet skipped: {e}",
-                        level="warning"
-                    )
-
+            job = ImportJob.objects.create(
+                file=file, lines_file=lines_file, file_hash=file_hash, created_by=request.user
+            )
             self.message_user(
                 request,
-                f"✅ Successfully imported {sales_order_count} Sales Orders and {order_line_count} Order Lines.",
+                f"✅ Upload received. Import #{job.pk} has been queued.",
                 level="success"
             )
-            return redirect("..")
+            return redirect("admin:SalesOrders_importjob_progress", job.pk)
 
         return render(request, "admin/salesorder_import.html", {"form": form})
     
 
+    def export_queryset(self, request):
+        """The format and the filtered orders of an export request; raises ExportError."""
+        # Export parameters are not changelist filters, so take them out before
+        # the changelist reads its search term, ordering and filters from GET.
+        params = request.GET.copy()
+        export_format = params.pop("format", ["xlsx"])[-1]
+        since = params.pop("since", [""])[-1]
+        request.GET = params
+
+        try:
+            orders = self.get_changelist_instance(request).get_queryset(request)
+        except IncorrectLookupParameters:
+            raise ExportError("Invalid filters for export.")
+
+        if since:
+            since_date = parse_date(since)
+            if since_date is None:
+                raise ExportError(f"Invalid 'since' date '{since}', use YYYY-MM-DD.")
+            # Orders created earlier but edited since are part of the delta too.
+            since_time = timezone.make_aware(datetime.datetime.combine(since_date, datetime.time.min))
+            orders = orders.filter(Q(creation_date__gte=since_date) | Q(updated_at__gte=since_time))
+        return export_format, orders
+
+    def export_lines(self, orders):
+        return SalesOrderLines.objects.filter(order_reference__in=orders.values("pk")).order_by("order_reference", "pk")
+
+    @read_replica()
     def export_orders(self, request):
-        from openpyxl import Workbook
-
-        # Create Excel workbook and sheets
-        wb = Workbook()
-        ws1 = wb.active
-        ws1.title = "Sales Orders"
-        ws2 = wb.create_sheet(title="Order Lines")
-
-        # Sheet 1: Sales Orders Header
-        ws1.append([
-            'Creation Date', 'Customer', 'Currency', 'Order Reference', 'Salesperson',
-            'Status', 'Total', 'Primary Contact', 'Finance Contact', 'Delivery Address',
-            'Invoice Address', 'Email Address', 'Delivery Date', 'Delivery Office Location',
-            'Tell No', 'Designation', 'Department', 'LPO Confirmation Date', 'LPO Date',
-            'LPO Number', 'Comments'
-        ])
-
-        for order in SalesOrder.objects.all():
-            ws1.append([
-                order.creation_date, order.customer, order.currency, order.order_reference,
-                order.salesperson, order.status, order.total, order.primary_contact,
-                order.finance_contact, order.delivery_address, order.invoice_address,
-                order.email_address, order.delivery_date, order.delivery_office_location,
-                order.tell_no, order.designation, order.department, order.lpo_confirmation_date,
-                order.lpo_date, order.lpo_number, order.comments
-            ])
-
-        # Sheet 2: Order Lines Header
-        ws2.append([
-            'Order Reference', 'Product', 'Quantity', 'Unit Price',
-            'Cost', 'Margin', 'Margin Percentage'
-        ])
-
-        for line in SalesOrderLines.objects.select_related('order_reference').all():
-            ws2.append([
-                line.order_reference.order_reference, line.product, line.quantity,
-                line.unit_price, line.cost, line.margin, line.margin_percentage
-            ]) 
-
-        # Set response headers
-        response = HttpResponse(content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-        response["Content-Disposition"] = 'attachment; filename="sales_orders_export.xlsx"'
-
-        # Save workbook to response
-        wb.save(response)
-        return response
+        try:
+            export_format, orders = self.export_queryset(request)
+        except ExportError as e:
+            self.message_user(request, f"❌ {e}", level="error")
+            return redirect("..")
+        return self.export_response(request, export_format, orders)
+
+    @read_replica()
+    async def export_orders_async(self, request):
+        """
+        ``export_orders`` for ASGI. Rows stream through the async ORM and the
+        workbook is written in the blocking pool, so a long download holds no
+        thread while it waits on the client.
+        """
+        try:
+            export_format, orders = await sync_to_async(self.export_queryset)(request)
+        except ExportError as e:
+            self.message_user(request, f"❌ {e}", level="error")
+            return redirect("..")
 
+        response = await aexport_response(export_format, orders, self.export_lines(orders))
+        if response is None:
+            self.message_user(request, "❌ Unknown export format.", level="error")
+            return redirect("..")
+        return stream_from_replica(response)
 
-    def print_pdf_view(self, request, object_id):
-        order = get_object_or_404(SalesOrder, pk=object_id)
-        order_lines = order.order_lines.all()
+    @read_replica()
+    def export_response(self, request, export_format, orders):
+        response = export_response(export_format, orders, self.export_lines(orders))
+        if response is None:
+            self.message_user(request, "❌ Unknown export format.", level="error")
+            return redirect("..")
+        # Admin actions run in the sync changelist view, also under ASGI.
+        return stream_async(stream_from_replica(response))
+
+    @admin.action(description="Export selected orders (Excel)")
+    def export_selected_xlsx(self, request, queryset):
+        return self.export_response(request, "xlsx", queryset.order_by("order_reference"))
 
-        template = get_template("admin/salesorder_pdf.html")
-        html = template.render({"order": order, "order_lines": order_lines})
+    @admin.action(description="Export selected orders (CSV)")
+    def export_selected_zip(self, request, queryset):
+        return self.export_response(request, "zip", queryset.order_by("order_reference"))
 
-        response = HttpResponse(content_type="application/pdf")
-        response["Content-Disposition"] = f'attachment; filename="SalesOrder_{order.order_reference}.pdf"'
 
-        pisa.CreatePDF(BytesIO(html.encode("UTF-8")), dest=response)
-        return response
+    @admin.action(description="Download PDFs of selected orders (ZIP)")
+    def export_selected_pdfs(self, request, queryset):
+        pdfs = render_order_pdfs(queryset.order_by("order_reference"))
+        # PDFs are already compressed, so store them as they are.
+        members = ((filename, [pdf]) for filename, pdf in pdfs)
+        response = StreamingHttpResponse(zip_chunks(members, compression=ZIP_STORED), content_type="application/zip")
+        response["Content-Disposition"] = 'attachment; filename="sales_order_pdfs.zip"'
+        return stream_async(stream_from_replica(response))
+
+    @read_replica()
+    def print_pdf_view(self, request, object_id):
+        order = get_object_or_404(SalesOrder, pk=object_id)
+        order_lines = list(order.order_lines.order_by("pk"))
+        fingerprint = order_fingerprint(order, order_lines)
+        not_modified = self.pdf_not_modified(request, fingerprint)
+        if not_modified is not None:
+            return not_modified
+        return self.pdf_response(request, order, *get_order_pdf(order, order_lines, fingerprint))
+
+    @read_replica()
+    async def print_pdf_view_async(self, request, object_id):
+        """``print_pdf_view`` for ASGI; the PDF is rendered in the blocking pool."""
+        order = await aget_object_or_404(SalesOrder, pk=object_id)
+        order_lines = [line async for line in order.order_lines.order_by("pk")]
+        fingerprint = order_fingerprint(order, order_lines)
+        not_modified = self.pdf_not_modified(request, fingerprint)
+        if not_modified is not None:
+            return not_modified
+        return self.pdf_response(request, order, *await run_blocking(get_order_pdf, order, order_lines, fingerprint))
+
+    def pdf_not_modified(self, request, fingerprint):
+        """
+        The 304 for a revalidation whose ETag still matches, or None.
+
+        Checked before the PDF is looked up, so revalidating costs two
+        queries even when this process has no cached copy to serve.
+        """
+        headers = HttpResponse()
+        headers["ETag"] = quote_etag(fingerprint)
+        patch_cache_control(headers, private=True, no_cache=True)
+        response = get_conditional_response(request, etag=headers["ETag"], response=headers)
+        return None if response is headers else response
+
+    def pdf_response(self, request, order, pdf, fingerprint, rendered_at):
+        etag = quote_etag(fingerprint)
+
+        response = HttpResponse(pdf, content_type="application/pdf")
+        response["Content-Disposition"] = f'attachment; filename="{pdf_filename(order.pk)}"'
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(rendered_at)
+        patch_cache_control(response, private=True, no_cache=True)
+        return get_conditional_response(request, etag=etag, last_modified=int(rendered_at), response=response)
 
     def status_badge(self, obj):
         color = {
@@ -231,3 +376,52 @@ class SalesOrderLinesAdmin(admin.ModelAdmin):
 
 
 admin.site.register(SalesOrderLines, SalesOrderLinesAdmin)
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "status", "created_by", "created_at", "rows_processed", "error_count", "progress_link")
+    list_filter = ("status",)
+    readonly_fields = [field.name for field in ImportJob._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path("<int:job_id>/progress/", self.admin_site.admin_view(self.progress_view), name="SalesOrders_importjob_progress"),
+            path("<int:job_id>/status/", self.admin_site.admin_view(self.status_view), name="SalesOrders_importjob_status"),
+        ]
+        return custom_urls + urls
+
+    def progress_view(self, request, job_id):
+        job = get_object_or_404(ImportJob, pk=job_id)
+        context = {
+            **self.admin_site.each_context(request),
+            "title": str(job),
+            "job": job,
+            "opts": self.model._meta,
+        }
+        return render(request, "admin/importjob_progress.html", context)
+
+    def status_view(self, request, job_id):
+        job = get_object_or_404(ImportJob, pk=job_id)
+        return JsonResponse({
+            "status": job.status,
+            "status_display": job.get_status_display(),
+            "finished": job.is_finished,
+            "total_rows": job.total_rows,
+            "rows_processed": job.rows_processed,
+            "rows_per_second": job.rows_per_second,
+            "progress_percent": job.progress_percent,
+            "orders_imported": job.orders_imported,
+            "lines_imported": job.lines_imported,
+            "error_count": job.error_count,
+            "message": job.message,
+        })
+
+    def progress_link(self, obj):
+        return format_html('<a href="{}">View progress</a>', reverse("admin:SalesOrders_importjob_progress", args=[obj.pk]))
+
+    progress_link.short_description = "Progress"
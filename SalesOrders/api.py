@@ -0,0 +1,219 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from .caching import CACHED_PAGES, cache_stats
+from .changes import CHANGE_FEEDS
+from .importer import LINE_COLUMNS, ORDER_COLUMNS
+from .models import SalesOrder, SalesOrderLines
+from .pagination import InvalidCursor
+from .routers import read_replica, stream_from_replica
+
+API_BATCH_SIZE = 1000
+API_DEFAULT_PAGE_SIZE = 500
+API_MAX_PAGE_SIZE = 5000
+
+LINE_API_FIELDS = ["id"] + LINE_COLUMNS[1:]
+
+
+class ApiError(Exception):
+    pass
+
+
+def parse_fields(value):
+    if not value:
+        return list(ORDER_COLUMNS)
+    fields = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in fields if name not in ORDER_COLUMNS]
+    if unknown:
+        raise ApiError(f"Unknown field(s): {', '.join(unknown)}")
+    # The cursor is built from order_reference, so it is always returned.
+    if "order_reference" not in fields:
+        fields.insert(0, "order_reference")
+    return fields
+
+
+def parse_limit(value, default, maximum):
+    if not value:
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ApiError("limit must be a number.")
+    if limit < 1:
+        raise ApiError("limit must be at least 1.")
+    return min(limit, maximum) if maximum else limit
+
+
+def order_batches(fields, after=None, limit=None, with_lines=False, batch_size=API_BATCH_SIZE):
+    """
+    Yield lists of order dicts in ``order_reference`` order.
+
+    Every batch costs one keyset query for the orders plus, when
+    ``with_lines`` is set, one query for all of their lines, so memory stays
+    bounded by ``batch_size`` however many orders are read.
+    """
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = batch_size if remaining is None else min(batch_size, remaining)
+        orders = SalesOrder.objects.order_by("order_reference")
+        if after is not None:
+            orders = orders.filter(order_reference__gt=after)
+        batch = list(orders.values(*fields)[:size])
+        if not batch:
+            return
+
+        if with_lines:
+            lines_by_order = {order["order_reference"]: [] for order in batch}
+            lines = SalesOrderLines.objects.filter(order_reference__in=lines_by_order).order_by("order_reference", "pk")
+            for line in lines.values("order_reference_id", *LINE_API_FIELDS):
+                lines_by_order[line.pop("order_reference_id")].append(line)
+            for order in batch:
+                order["order_lines"] = lines_by_order[order["order_reference"]]
+
+        yield batch
+        after = batch[-1]["order_reference"]
+        if remaining is not None:
+            remaining -= len(batch)
+        if len(batch) < size:
+            return
+
+
+async def aorder_batches(fields, after=None, limit=None, with_lines=False, batch_size=API_BATCH_SIZE):
+    """``order_batches`` through the async ORM."""
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = batch_size if remaining is None else min(batch_size, remaining)
+        orders = SalesOrder.objects.order_by("order_reference")
+        if after is not None:
+            orders = orders.filter(order_reference__gt=after)
+        batch = [order async for order in orders.values(*fields)[:size]]
+        if not batch:
+            return
+
+        if with_lines:
+            lines_by_order = {order["order_reference"]: [] for order in batch}
+            lines = SalesOrderLines.objects.filter(order_reference__in=lines_by_order).order_by("order_reference", "pk")
+            async for line in lines.values("order_reference_id", *LINE_API_FIELDS):
+                lines_by_order[line.pop("order_reference_id")].append(line)
+            for order in batch:
+                order["order_lines"] = lines_by_order[order["order_reference"]]
+
+        yield batch
+        after = batch[-1]["order_reference"]
+        if remaining is not None:
+            remaining -= len(batch)
+        if len(batch) < size:
+            return
+
+
+def ndjson_lines(batches):
+    encoder = DjangoJSONEncoder()
+    for batch in batches:
+        yield "".join(encoder.encode(order) + "\n" for order in batch)
+
+
+async def andjson_lines(batches):
+    encoder = DjangoJSONEncoder()
+    async for batch in batches:
+        yield "".join(encoder.encode(order) + "\n" for order in batch)
+
+
+def feed_params(request):
+    """Parse the ``orders_feed`` query string; raises ApiError."""
+    export_format = request.GET.get("format", "ndjson")
+    fields = parse_fields(request.GET.get("fields"))
+    after = request.GET.get("after") or None
+    if export_format == "ndjson":
+        limit = parse_limit(request.GET.get("limit"), None, None)
+    elif export_format == "json":
+        limit = parse_limit(request.GET.get("limit"), API_DEFAULT_PAGE_SIZE, API_MAX_PAGE_SIZE)
+    else:
+        raise ApiError("format must be 'ndjson' or 'json'.")
+    with_lines = request.GET.get("lines") in ("1", "true", "yes")
+    return export_format, fields, after, limit, with_lines
+
+
+def page_response(results, limit):
+    next_cursor = results[-1]["order_reference"] if len(results) == limit else None
+    return JsonResponse({"results": results, "next": next_cursor}, json_dumps_params={"separators": (",", ":")})
+
+
+@staff_member_required
+@require_GET
+@read_replica()
+def orders_feed(request):
+    """
+    Read-only feed of sales orders for downstream sync jobs.
+
+    Query parameters: ``format`` (``ndjson``, the default, or ``json``),
+    ``after`` (the last ``order_reference`` already received), ``limit``,
+    ``fields`` (comma-separated order columns) and ``lines=1`` to embed
+    order lines. NDJSON streams every remaining order unless ``limit`` is
+    given; JSON returns one page and the ``next`` cursor.
+    """
+    try:
+        export_format, fields, after, limit, with_lines = feed_params(request)
+    except ApiError as e:
+        return HttpResponseBadRequest(str(e))
+
+    batches = order_batches(fields, after=after, limit=limit, with_lines=with_lines)
+
+    if export_format == "ndjson":
+        response = StreamingHttpResponse(ndjson_lines(batches), content_type="application/x-ndjson")
+        return stream_from_replica(response)
+
+    return page_response([order for batch in batches for order in batch], limit)
+
+
+@staff_member_required
+@require_GET
+@read_replica()
+async def orders_feed_async(request):
+    """``orders_feed`` for ASGI, reading through the async ORM."""
+    try:
+        export_format, fields, after, limit, with_lines = feed_params(request)
+    except ApiError as e:
+        return HttpResponseBadRequest(str(e))
+
+    batches = aorder_batches(fields, after=after, limit=limit, with_lines=with_lines)
+
+    if export_format == "ndjson":
+        response = StreamingHttpResponse(andjson_lines(batches), content_type="application/x-ndjson")
+        return stream_from_replica(response)
+
+    return page_response([order async for batch in batches for order in batch], limit)
+
+
+@staff_member_required
+@require_GET
+def changes_feed(request):
+    """
+    Orders, order lines or deletions changed since a cursor, for incremental sync.
+
+    Query parameters: ``kind`` (``orders``, ``lines`` or ``deletions``),
+    ``after`` (the ``cursor`` of the previous page; omit it for a full
+    load) and ``limit``. Request pages until ``has_more`` is false and keep
+    the last ``cursor`` for the next sync.
+    """
+    feed = CHANGE_FEEDS.get(request.GET.get("kind", ""))
+    if feed is None:
+        return HttpResponseBadRequest(f"kind must be one of: {', '.join(CHANGE_FEEDS)}.")
+    try:
+        limit = parse_limit(request.GET.get("limit"), API_DEFAULT_PAGE_SIZE, API_MAX_PAGE_SIZE)
+        rows, cursor, has_more = feed.page(request.GET.get("after") or None, limit)
+    except ApiError as e:
+        return HttpResponseBadRequest(str(e))
+    except InvalidCursor:
+        return HttpResponseBadRequest("Invalid cursor.")
+    return JsonResponse(
+        {"results": rows, "cursor": cursor, "has_more": has_more}, json_dumps_params={"separators": (",", ":")}
+    )
+
+
+@staff_member_required
+@require_GET
+def page_cache_stats(request):
+    """Hit and miss counts of the cached pages in this process, and the current data version."""
+    return JsonResponse(cache_stats(CACHED_PAGES))
@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.db.models import Q
+
+from .models import SalesOrder
+
+AUTOCOMPLETE_LIMIT = 60  # three pages of the admin autocomplete widget
+CACHE_SIZE = 256
+CACHE_TTL = 60  # seconds; bounds staleness from writes made by other processes
+
+
+class SuggestionCache:
+    """Small thread-safe LRU of recent autocomplete terms and their results."""
+
+    def __init__(self, size=CACHE_SIZE, ttl=CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, term):
+        with self.lock:
+            entry = self.entries.get(term)
+            if entry is None:
+                return None
+            stored_at, results = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self.entries[term]
+                return None
+            self.entries.move_to_end(term)
+            return results
+
+    def set(self, term, results):
+        with self.lock:
+            self.entries[term] = (time.monotonic(), results)
+            self.entries.move_to_end(term)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+suggestion_cache = SuggestionCache()
+
+
+def suggest_orders(term, limit=AUTOCOMPLETE_LIMIT):
+    """
+    Return the primary keys of the most recent orders whose reference or
+    customer starts with ``term``.
+
+    Prefix matches can use the ``varchar_pattern_ops`` indexes on PostgreSQL,
+    and the recency ordering walks the (creation_date, order_reference) index.
+    """
+    # References are matched case-sensitively (as typed and upper-cased) to
+    # keep to the index, so "so1" and "SO1" are cached separately.
+    term = term.strip()
+    results = suggestion_cache.get(term)
+    if results is not None:
+        return results
+
+    orders = SalesOrder.objects.all()
+    if term:
+        orders = orders.filter(
+            Q(order_reference__startswith=term)
+            | Q(order_reference__startswith=term.upper())
+            | Q(customer__istartswith=term)
+        )
+    results = list(
+        orders.order_by("-creation_date", "-order_reference").values_list("pk", flat=True)[:limit]
+    )
+    suggestion_cache.set(term, results)
+    return results
+
+
+def invalidate_suggestions():
+    suggestion_cache.clear()
@@ -0,0 +1,157 @@
+import datetime
+import io
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .caching import bump_version
+from .jobs import run_job
+from .models import ImportJob, SalesOrder, SalesOrderLines
+from .pdf import pdf_cache
+from .synthetic import SyntheticSalesData
+
+BENCHMARK_USER = "benchmark"
+# Time differences below this are noise, whatever the ratio.
+MIN_REGRESSION_SECONDS = 0.01
+
+
+class Scenario:
+    def __init__(self, name, run, setup=None):
+        self.name = name
+        self.run = run
+        self.setup = setup
+
+
+def read_response(response):
+    """Return the size of the response body, consuming streamed content."""
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+class Benchmark:
+    """
+    Times the main read and write paths through the real views.
+
+    Every run happens in a transaction that is rolled back, so the suite
+    can be pointed at any database without changing its data. Requests go
+    through Django's test client as a superuser; the import scenario
+    uploads a synthetic workbook and runs the queued job.
+    """
+
+    def __init__(self, repeat=3, import_orders=1000):
+        self.repeat = repeat
+        self.import_orders = import_orders
+        self.user = None
+        self.client = Client(HTTP_HOST="localhost")
+
+    def scenarios(self):
+        order = SalesOrder.objects.order_by("-creation_date", "-order_reference").only("pk", "customer", "status").first()
+        changelist = reverse("admin:SalesOrders_salesorder_changelist")
+        export = reverse("admin:SalesOrders_salesorder_export_orders")
+        scenarios = [
+            # A new data version before each run, so the page is rendered rather than served from the page cache.
+            Scenario("orders_list", lambda: self.client.get(reverse("orders")), setup=bump_version),
+            Scenario("changelist", lambda: self.client.get(changelist)),
+            Scenario("import_orders", self.import_workbook, setup=self.build_workbook),
+        ]
+        if order is not None:
+            search_term = order.customer.split()[0]
+            scenarios += [
+                Scenario(
+                    "orders_list_filtered",
+                    lambda: self.client.get(reverse("orders"), {"status": order.status}),
+                    setup=bump_version,
+                ),
+                Scenario("changelist_search", lambda: self.client.get(changelist, {"q": search_term})),
+                Scenario("export_xlsx", lambda: self.client.get(export, {"format": "xlsx"})),
+                Scenario("export_zip", lambda: self.client.get(export, {"format": "zip"})),
+                Scenario(
+                    "print_pdf",
+                    lambda: self.client.get(reverse("admin:SalesOrders_salesorder_print_pdf", args=[order.pk])),
+                    setup=lambda: pdf_cache().clear(),
+                ),
+            ]
+        return scenarios
+
+    def build_workbook(self):
+        self.workbook = io.BytesIO()
+        SyntheticSalesData(self.import_orders, prefix="BENCH", seed=7).write_xlsx(self.workbook)
+        self.workbook.name = "benchmark.xlsx"
+
+    def import_workbook(self):
+        self.workbook.seek(0)
+        response = self.client.post(reverse("admin:SalesOrders_salesorder_import_orders"), {"file": self.workbook})
+        # Only the job this upload queued: other pending jobs are real uploads.
+        # It is not committed yet, so no worker can claim it first.
+        job = ImportJob.objects.filter(created_by=self.user, status=ImportJob.PENDING).first()
+        if job is not None:
+            # run_job() deletes the upload when it finishes; the rollback undoes the rest.
+            run_job(job)
+        return response
+
+    def measure(self, scenario):
+        timings = []
+        for _ in range(self.repeat):
+            if scenario.setup is not None:
+                scenario.setup()
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = scenario.run()
+                    size = read_response(response)
+                    timings.append(time.perf_counter() - started)
+                transaction.set_rollback(True)
+        return {
+            "seconds": round(statistics.median(timings), 4),
+            "min_seconds": round(min(timings), 4),
+            "queries": len(queries),
+            "status": response.status_code,
+            "bytes": size,
+        }
+
+    def run(self, only=None):
+        with transaction.atomic():
+            self.user = get_user_model().objects.create_superuser(BENCHMARK_USER, "benchmark@example.com", None)
+            self.client.force_login(self.user)
+            results = {
+                "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+                "database": connection.vendor,
+                "orders": SalesOrder.objects.count(),
+                "lines": SalesOrderLines.objects.count(),
+                "repeat": self.repeat,
+                "scenarios": {},
+            }
+            for scenario in self.scenarios():
+                if only and scenario.name not in only:
+                    continue
+                results["scenarios"][scenario.name] = self.measure(scenario)
+            transaction.set_rollback(True)
+        return results
+
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Return a description of every scenario that got slower or ran more
+    queries than in ``baseline``.
+
+    Time regressions need to exceed both ``tolerance`` (a fraction of the
+    baseline) and ``MIN_REGRESSION_SECONDS``. Query counts are compared
+    exactly.
+    """
+    regressions = []
+    for name, result in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        limit = max(before["seconds"] * (1 + tolerance), before["seconds"] + MIN_REGRESSION_SECONDS)
+        if result["seconds"] > limit:
+            regressions.append(f"{name}: {result['seconds']:.3f}s, baseline {before['seconds']:.3f}s")
+        if result["queries"] > before["queries"]:
+            regressions.append(f"{name}: {result['queries']} queries, baseline {before['queries']}")
+    return regressions
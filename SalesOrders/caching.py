@@ -0,0 +1,143 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+VERSION_KEY = "salesorders:pages:version"
+PAGE_CACHE_TIMEOUT = 300
+
+
+def page_cache_alias():
+    return getattr(settings, "SALESORDERS_PAGE_CACHE", "default")
+
+
+def page_cache():
+    return caches[page_cache_alias()]
+
+
+def page_cache_timeout():
+    return getattr(settings, "SALESORDERS_PAGE_CACHE_TIMEOUT", PAGE_CACHE_TIMEOUT)
+
+
+def new_version():
+    # FileBasedCache has no atomic incr, and culls entries at random, the
+    # version included. A fresh value from the clock never needs the old one
+    # and never revives pages cached under an earlier number.
+    return time.time_ns()
+
+
+def data_version():
+    """
+    Current version of the order data, part of every page cache key.
+
+    Bumping it makes every cached page unreachable at once; the old entries
+    simply expire.
+    """
+    cache = page_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = new_version()
+        cache.add(VERSION_KEY, version, timeout=None)
+        version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def bump_version():
+    version = new_version()
+    page_cache().set(VERSION_KEY, version, timeout=None)
+    return version
+
+
+# Hit and miss counts of this process. Kept in memory: counting in the shared
+# file cache would cost a file rewrite on every request, and lose counts.
+page_stats = Counter()
+page_stats_lock = threading.Lock()
+
+
+def count(name, outcome):
+    with page_stats_lock:
+        page_stats[name, outcome] += 1
+
+
+def cache_stats(names):
+    with page_stats_lock:
+        stats = {
+            name: {outcome: page_stats[name, outcome] for outcome in ("hits", "misses")} for name in names
+        }
+    return {"version": data_version(), "pages": stats}
+
+
+def page_key(name, request):
+    path = hashlib.md5(request.get_full_path().encode("utf-8")).hexdigest()
+    return f"salesorders:pages:{name}:v{data_version()}:{path}"
+
+
+CACHED_PAGES = []
+
+
+def cached_response(name, request):
+    """Return ``(key, response)``; the response is None on a miss."""
+    key = page_key(name, request)
+    response = page_cache().get(key)
+    count(name, "misses" if response is None else "hits")
+    return key, response
+
+
+def store_response(key, response):
+    if response.status_code == 200 and not response.streaming and not response.cookies:
+        page_cache().set(key, response, page_cache_timeout())
+
+
+def cached_page(name):
+    """
+    Cache a view's successful GET responses under a data-versioned key.
+
+    For pages that show the same thing to everyone. The key includes the
+    full query string, so every filter and cursor combination is cached on
+    its own, and ``bump_version()`` invalidates all of them together.
+    Works on async views too.
+    """
+    CACHED_PAGES.append(name)
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method not in ("GET", "HEAD"):
+                    return await view(request, *args, **kwargs)
+
+                key, response = await sync_to_async(cached_response)(name, request)
+                if response is not None:
+                    response["X-Cache"] = "HIT"
+                    return response
+
+                response = await view(request, *args, **kwargs)
+                await sync_to_async(store_response)(key, response)
+                response["X-Cache"] = "MISS"
+                return response
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+
+            key, response = cached_response(name, request)
+            if response is not None:
+                response["X-Cache"] = "HIT"
+                return response
+
+            response = view(request, *args, **kwargs)
+            store_response(key, response)
+            response["X-Cache"] = "MISS"
+            return response
+
+        return wrapper
+
+    return decorator
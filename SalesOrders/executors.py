@@ -0,0 +1,85 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+BLOCKING_WORKERS = 4
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def async_views_enabled():
+    """True when the ASGI entry point serves the async versions of the heavy views."""
+    return getattr(settings, "SALESORDERS_ASYNC_VIEWS", False)
+
+
+def blocking_executor():
+    """
+    The thread pool for blocking work started from async views.
+
+    Bounded by ``SALESORDERS_BLOCKING_WORKERS``, so a burst of exports can
+    neither start unlimited threads nor open unlimited database connections;
+    extra work waits for a free thread.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "SALESORDERS_BLOCKING_WORKERS", BLOCKING_WORKERS),
+                thread_name_prefix="salesorders-blocking",
+            )
+        return _executor
+
+
+def managing_connections(func):
+    # Pool threads outlive requests, so give their connections the same
+    # age and health checks a request would.
+    @wraps(func)
+    def inner(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return inner
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Await ``func(*args, **kwargs)`` run in the blocking pool.
+
+    For CPU-bound or synchronous ORM work (workbook writing, PDF rendering)
+    that must not hold up the event loop or the thread shared by the sync
+    views. Context variables, such as the request timing and the read
+    replica flag, are carried over.
+    """
+    run = sync_to_async(managing_connections(func), thread_sensitive=False, executor=blocking_executor())
+    return await run(*args, **kwargs)
+
+
+async def aiterate(chunks):
+    """
+    Iterate a sync iterator from async code, one item at a time.
+
+    Each step runs in the request's sync thread, so ORM iterators keep
+    their connection. Under ASGI, Django reads a sync streaming response
+    with ``sync_to_async(list)``: the whole body is built in memory
+    before the first byte is sent.
+    """
+    chunks = iter(chunks)
+    step = sync_to_async(next)
+    done = object()
+    while (chunk := await step(chunks, done)) is not done:
+        yield chunk
+
+
+def stream_async(response):
+    """Serve a sync streaming response through ``aiterate`` when async views are on."""
+    if async_views_enabled() and response.streaming and not response.is_async:
+        response.streaming_content = aiterate(response.streaming_content)
+    return response
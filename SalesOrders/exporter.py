@@ -0,0 +1,251 @@
+import csv
+import io
+import os
+import tempfile
+import zipfile
+
+from django.http import FileResponse, StreamingHttpResponse
+from openpyxl import Workbook
+
+from .executors import run_blocking
+from .importer import LINE_COLUMNS, ORDER_COLUMNS
+from .timing import section
+
+# Sheet headers, in the column order the importer reads back.
+ORDER_HEADERS = [
+    'Creation Date', 'Customer', 'Currency', 'Order Reference', 'Salesperson',
+    'Status', 'Total', 'Primary Contact', 'Finance Contact', 'Delivery Address',
+    'Invoice Address', 'Email Address', 'Delivery Date', 'Delivery Office Location',
+    'Tell No', 'Designation', 'Department', 'LPO Confirmation Date', 'LPO Date',
+    'LPO Number', 'Comments',
+    # Read-only aggregates of the order's lines; the importer ignores them.
+    'Line Count', 'Lines Revenue', 'Lines Cost', 'Lines Margin'
+]
+LINE_HEADERS = [
+    'Order Reference', 'Product', 'Quantity', 'Unit Price',
+    'Cost', 'Margin', 'Margin Percentage'
+]
+
+ORDER_EXPORT_COLUMNS = ORDER_COLUMNS + ["line_count", "lines_revenue", "lines_cost", "lines_margin"]
+
+ORDERS_CSV_NAME = "sales_orders.csv"
+LINES_CSV_NAME = "order_lines.csv"
+
+EXPORT_CHUNK_SIZE = 2000
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+FILE_BLOCK_SIZE = 64 * 1024
+
+
+def order_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield export rows as plain tuples, fetching ``chunk_size`` orders at a time."""
+    return queryset.values_list(*ORDER_EXPORT_COLUMNS).iterator(chunk_size=chunk_size)
+
+
+def line_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    columns = ["order_reference_id"] + LINE_COLUMNS[1:]
+    return queryset.values_list(*columns).iterator(chunk_size=chunk_size)
+
+
+def aorder_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    ``order_rows`` for async views: the async ORM fetches one chunk at a time.
+
+    Plain ``values_list().aiterator()`` runs its query on the event loop and
+    fails; the named variant iterates lazily and its rows are still tuples.
+    """
+    return queryset.values_list(*ORDER_EXPORT_COLUMNS, named=True).aiterator(chunk_size=chunk_size)
+
+
+def aline_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    columns = ["order_reference_id"] + LINE_COLUMNS[1:]
+    return queryset.values_list(*columns, named=True).aiterator(chunk_size=chunk_size)
+
+
+def write_xlsx(target, orders, lines):
+    """Write both sheets with openpyxl's write-only mode, one row in memory at a time."""
+    wb = Workbook(write_only=True)
+    ws1 = wb.create_sheet(title="Sales Orders")
+    ws1.append(ORDER_HEADERS)
+    for row in order_rows(orders):
+        ws1.append(row)
+
+    ws2 = wb.create_sheet(title="Order Lines")
+    ws2.append(LINE_HEADERS)
+    for row in line_rows(lines):
+        ws2.append(row)
+
+    wb.save(target)
+
+
+def csv_chunks(headers, rows, batch_size=500):
+    """Encode rows as UTF-8 CSV, yielding one block of bytes per ``batch_size`` rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % batch_size == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+async def acsv_chunks(headers, rows, batch_size=500):
+    """``csv_chunks`` over an async iterable of rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    count = 0
+    async for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % batch_size == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+class StreamBuffer(io.RawIOBase):
+    """Write-only, unseekable sink whose contents are drained by a generator."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def zip_chunks(members, compression=zipfile.ZIP_DEFLATED):
+    """
+    Stream a ZIP archive built from ``(name, byte_chunks)`` pairs.
+
+    zipfile writes data descriptors when the target cannot seek, so the
+    archive can go out as it is produced instead of being assembled first.
+    """
+    buffer = StreamBuffer()
+    with zipfile.ZipFile(buffer, "w", compression=compression) as archive:
+        for name, chunks in members:
+            with archive.open(name, "w", force_zip64=True) as member:
+                for chunk in chunks:
+                    member.write(chunk)
+                    yield buffer.drain()
+    yield buffer.drain()
+
+
+async def azip_chunks(members, compression=zipfile.ZIP_DEFLATED):
+    """``zip_chunks`` for members whose byte chunks come from async iterables."""
+    buffer = StreamBuffer()
+    with zipfile.ZipFile(buffer, "w", compression=compression) as archive:
+        for name, chunks in members:
+            with archive.open(name, "w", force_zip64=True) as member:
+                async for chunk in chunks:
+                    member.write(chunk)
+                    yield buffer.drain()
+    yield buffer.drain()
+
+
+async def afile_chunks(file, block_size=FILE_BLOCK_SIZE):
+    # A local temporary file: reads are short enough to do on the event loop.
+    with file:
+        while block := file.read(block_size):
+            yield block
+
+
+def attachment(response, filename):
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def xlsx_file(orders, lines):
+    # Write-only workbooks still need a seekable target, so spool to disk.
+    tmp = tempfile.TemporaryFile()
+    write_xlsx(tmp, orders, lines)
+    tmp.seek(0)
+    return tmp
+
+
+def xlsx_response(orders, lines, filename="sales_orders_export.xlsx"):
+    with section("workbook_save"):
+        tmp = xlsx_file(orders, lines)
+    return FileResponse(tmp, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+
+async def axlsx_response(orders, lines, filename="sales_orders_export.xlsx"):
+    """
+    ``xlsx_response`` for async views.
+
+    The workbook is written in the blocking pool. The finished file is then
+    streamed from an async iterator, since ASGI reads a FileResponse into
+    memory in one go.
+    """
+    with section("workbook_save"):
+        tmp = await run_blocking(xlsx_file, orders, lines)
+    size = os.fstat(tmp.fileno()).st_size
+    response = StreamingHttpResponse(afile_chunks(tmp), content_type=XLSX_CONTENT_TYPE)
+    response["Content-Length"] = size
+    return attachment(response, filename)
+
+
+def csv_response(headers, rows, filename):
+    response = StreamingHttpResponse(csv_chunks(headers, rows), content_type="text/csv; charset=utf-8")
+    return attachment(response, filename)
+
+
+def acsv_response(headers, rows, filename):
+    response = StreamingHttpResponse(acsv_chunks(headers, rows), content_type="text/csv; charset=utf-8")
+    return attachment(response, filename)
+
+
+def zip_response(orders, lines, filename="sales_orders_export.zip"):
+    members = [
+        (ORDERS_CSV_NAME, csv_chunks(ORDER_HEADERS, order_rows(orders))),
+        (LINES_CSV_NAME, csv_chunks(LINE_HEADERS, line_rows(lines))),
+    ]
+    response = StreamingHttpResponse(zip_chunks(members), content_type="application/zip")
+    return attachment(response, filename)
+
+
+def azip_response(orders, lines, filename="sales_orders_export.zip"):
+    members = [
+        (ORDERS_CSV_NAME, acsv_chunks(ORDER_HEADERS, aorder_rows(orders))),
+        (LINES_CSV_NAME, acsv_chunks(LINE_HEADERS, aline_rows(lines))),
+    ]
+    response = StreamingHttpResponse(azip_chunks(members), content_type="application/zip")
+    return attachment(response, filename)
+
+
+def export_response(export_format, orders, lines):
+    """Build the download for ``export_format``, or return None if it is unknown."""
+    if export_format == "xlsx":
+        return xlsx_response(orders, lines)
+    if export_format == "zip":
+        return zip_response(orders, lines)
+    if export_format == "csv":
+        return csv_response(ORDER_HEADERS, order_rows(orders), ORDERS_CSV_NAME)
+    if export_format == "lines.csv":
+        return csv_response(LINE_HEADERS, line_rows(lines), LINES_CSV_NAME)
+    return None
+
+
+async def aexport_response(export_format, orders, lines):
+    """``export_response`` for async views; the CSV and ZIP downloads stream through the async ORM."""
+    if export_format == "xlsx":
+        return await axlsx_response(orders, lines)
+    if export_format == "zip":
+        return azip_response(orders, lines)
+    if export_format == "csv":
+        return acsv_response(ORDER_HEADERS, aorder_rows(orders), ORDERS_CSV_NAME)
+    if export_format == "lines.csv":
+        return acsv_response(LINE_HEADERS, aline_rows(lines), LINES_CSV_NAME)
+    return None
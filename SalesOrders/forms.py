@@ -1,5 +1,26 @@
 # forms.py
 from django import forms
 
+from .readers import SPREADSHEET_EXTENSIONS, file_extension
+
+
 class SalesOrderImportForm(forms.Form):
-    file = forms.FileField(label="Upload Spreadsheet (.xlsx or .csv)")
+    file = forms.FileField(label="Upload Spreadsheet (.xlsx, .csv or .zip of two CSVs)")
+    lines_file = forms.FileField(label="Order Lines (.csv, only when uploading CSV files)", required=False)
+    force = forms.BooleanField(label="Import even if this exact file was the last one imported", required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        file = cleaned_data.get("file")
+        if file is None:
+            return cleaned_data
+
+        if file_extension(file) not in SPREADSHEET_EXTENSIONS:
+            self.add_error("file", f"Upload one of: {', '.join(SPREADSHEET_EXTENSIONS)}.")
+        elif file_extension(file) == ".csv":
+            lines_file = cleaned_data.get("lines_file")
+            if lines_file is None:
+                self.add_error("lines_file", "A CSV upload needs a second CSV with the Order Lines.")
+            elif file_extension(lines_file) != ".csv":
+                self.add_error("lines_file", "Order Lines must be a .csv file.")
+        return cleaned_data
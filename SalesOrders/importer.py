@@ -0,0 +1,333 @@
+from collections import defaultdict
+from decimal import Decimal
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, connections, router, transaction
+
+from .models import SalesOrder, SalesOrderLines, row_hash
+from .caching import bump_version
+from .rollups import month_start, refresh_periods
+from .timing import section
+
+# Column order of the two import sheets (same layout as export_orders).
+ORDER_COLUMNS = [
+    "creation_date", "customer", "currency", "order_reference", "salesperson",
+    "status", "total", "primary_contact", "finance_contact", "delivery_address",
+    "invoice_address", "email_address", "delivery_date", "delivery_office_location",
+    "tell_no", "designation", "department", "lpo_confirmation_date", "lpo_date",
+    "lpo_number", "comments",
+]
+LINE_COLUMNS = [
+    "order_reference", "product", "quantity", "unit_price", "cost", "margin", "margin_percentage",
+]
+
+ORDER_SHEET = "Sales Orders"
+LINES_SHEET = "Order Lines"
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def cell_value(value):
+    """
+    Normalise a spreadsheet cell for the model fields.
+
+    openpyxl reads numeric cells as floats, and DecimalField turns 12.3 into
+    Decimal("12.3000000000"), which fails its decimal places check.
+    ``str()`` gives the short form that was typed into the sheet.
+    """
+    if value == "":
+        return None
+    if isinstance(value, float):
+        return Decimal(str(value))
+    return value
+
+
+def format_errors(errors):
+    parts = []
+    for field, messages in errors.message_dict.items():
+        text = ", ".join(messages)
+        parts.append(text if field == "__all__" else f"{field}: {text}")
+    return "; ".join(parts)
+
+
+class ImportReport:
+    """Counts and row-level errors collected over one import run."""
+
+    def __init__(self):
+        self.orders_created = 0
+        self.orders_updated = 0
+        self.orders_unchanged = 0
+        self.lines_imported = 0
+        self.lines_unchanged = 0
+        self.lines_deleted = 0
+        self.rows_processed = 0
+        self.error_count = 0
+        self.errors = []
+
+    @property
+    def orders_imported(self):
+        return self.orders_created + self.orders_updated
+
+    @property
+    def changed(self):
+        return bool(self.orders_imported or self.lines_imported or self.lines_deleted)
+
+    def add_error(self, sheet, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((sheet, row_number, str(message)))
+
+    def summary(self):
+        return (
+            f"Imported {self.orders_imported} Sales Orders "
+            f"({self.orders_created} new, {self.orders_updated} updated, {self.orders_unchanged} unchanged) "
+            f"and {self.lines_imported} Order Lines "
+            f"({self.lines_unchanged} unchanged, {self.lines_deleted} removed)."
+        )
+
+    def error_summary(self, limit=10):
+        shown = [f"{sheet} row {row}: {message}" for sheet, row, message in self.errors[:limit]]
+        remaining = self.error_count - len(shown)
+        if remaining > 0:
+            shown.append(f"... and {remaining} more")
+        return "; ".join(shown)
+
+
+class OrderImporter:
+    """
+    Imports sales order and order line rows in chunks.
+
+    Each chunk is validated in Python, checked against the database with a
+    single query and written with bulk operations inside its own transaction.
+    Rows that fail validation are recorded on the report instead of aborting
+    the import.
+
+    Re-imports only write what changed: every row is fingerprinted with
+    ``row_hash()`` and compared with the hash stored on the database row.
+    Orders with the same hash are skipped, lines are matched to the stored
+    lines of their order by hash, and stored lines of those orders that the
+    file no longer lists are removed at the end (unless a line row of the
+    order was rejected). Importing the same file twice therefore writes
+    nothing the second time.
+    """
+
+    order_update_fields = [name for name in ORDER_COLUMNS if name != "order_reference"] + ["row_hash"]
+    line_excluded_from_clean = ["order_reference", "margin", "margin_percentage"]
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, report=None, on_chunk=None):
+        self.chunk_size = chunk_size
+        self.report = report or ImportReport()
+        self.on_chunk = on_chunk
+        # Months whose rollups need rebuilding once the import is done
+        self.periods = set()
+        # order_reference -> {row_hash: [pk, ...]} of lines not yet matched by the file
+        self.existing_lines = {}
+        # Orders with a line row that was rejected or failed to write; their
+        # unmatched stored lines may be that row's old version, so they are kept.
+        self.incomplete_orders = set()
+        self.db = router.db_for_write(SalesOrder)
+
+    @property
+    def supports_upsert(self):
+        return connections[self.db].features.supports_update_conflicts_with_target
+
+    def run(self, order_rows, line_rows):
+        self.import_orders(order_rows)
+        self.import_lines(line_rows)
+        with section("db_write"):
+            refresh_periods(self.periods, using=self.db)
+        if self.report.changed:
+            # bulk writes send no signals, so invalidate the cached pages here.
+            bump_version()
+        return self.report
+
+    def numbered_rows(self, rows):
+        """Yield ``(row_number, row)`` for non-empty rows, counting the header as row 1."""
+        for row_number, row in enumerate(rows, start=2):
+            if row and any(value not in (None, "") for value in row):
+                yield row_number, row
+
+    def row_values(self, columns, row):
+        values = list(row[:len(columns)])
+        values += [None] * (len(columns) - len(values))
+        return {name: cell_value(value) for name, value in zip(columns, values)}
+
+    def chunk_done(self, chunk):
+        self.report.rows_processed += len(chunk)
+        if self.on_chunk is not None:
+            self.on_chunk(self.report)
+
+    # --- Sales Orders ---
+
+    def import_orders(self, rows):
+        for chunk in chunked(self.numbered_rows(rows), self.chunk_size):
+            orders = {}
+            with section("import_parse"):
+                for row_number, row in chunk:
+                    order = self.build_order(row_number, row)
+                    if order is not None:
+                        # A later row for the same reference wins, as it did row by row.
+                        orders[order.order_reference] = order
+            if orders:
+                with section("db_write"):
+                    self.write_orders(chunk, list(orders.values()))
+            self.chunk_done(chunk)
+
+    def build_order(self, row_number, row):
+        order = SalesOrder(**self.row_values(ORDER_COLUMNS, row))
+        try:
+            order.full_clean(validate_unique=False, validate_constraints=False)
+        except ValidationError as e:
+            self.report.add_error(ORDER_SHEET, row_number, format_errors(e))
+            return None
+        order.row_hash = row_hash(order)
+        return order
+
+    def write_orders(self, chunk, orders):
+        refs = [order.order_reference for order in orders]
+        try:
+            with transaction.atomic(using=self.db):
+                existing = {
+                    pk: (creation_date, stored_hash)
+                    for pk, creation_date, stored_hash in SalesOrder.objects.using(self.db)
+                    .filter(pk__in=refs)
+                    .values_list("pk", "creation_date", "row_hash")
+                }
+                changed = [order for order in orders if existing.get(order.pk, (None, None))[1] != order.row_hash]
+                if changed and self.supports_upsert:
+                    SalesOrder.objects.using(self.db).bulk_create(
+                        changed,
+                        update_conflicts=True,
+                        unique_fields=["order_reference"],
+                        update_fields=self.order_update_fields,
+                    )
+                elif changed:
+                    SalesOrder.objects.using(self.db).bulk_create(
+                        [order for order in changed if order.pk not in existing]
+                    )
+                    SalesOrder.objects.using(self.db).bulk_update(
+                        [order for order in changed if order.pk in existing], self.order_update_fields
+                    )
+        except DatabaseError as e:
+            self.report.add_error(ORDER_SHEET, f"{chunk[0][0]}-{chunk[-1][0]}", e)
+            return
+        updated = [order for order in changed if order.pk in existing]
+        self.periods.update(month_start(existing[order.pk][0]) for order in updated)
+        self.periods.update(month_start(order.creation_date) for order in changed)
+        self.report.orders_updated += len(updated)
+        self.report.orders_created += len(changed) - len(updated)
+        self.report.orders_unchanged += len(orders) - len(changed)
+
+    # --- Sales Order Lines ---
+
+    def import_lines(self, rows):
+        for chunk in chunked(self.numbered_rows(rows), self.chunk_size):
+            refs = {str(row[0]) for _, row in chunk if row[0] not in (None, "")}
+            existing = dict(
+                SalesOrder.objects.using(self.db).filter(pk__in=refs).values_list("pk", "creation_date")
+            )
+            self.load_existing_lines(existing)
+            lines = []
+            with section("import_parse"):
+                for row_number, row in chunk:
+                    line = self.build_line(row_number, row, existing)
+                    if line is None:
+                        continue
+                    matches = self.existing_lines[line.order_reference_id].get(line.row_hash)
+                    if matches:
+                        matches.pop()
+                        self.report.lines_unchanged += 1
+                    else:
+                        lines.append(line)
+            if lines:
+                with section("db_write"):
+                    self.write_lines(chunk, lines)
+                self.periods.update(month_start(existing[line.order_reference_id]) for line in lines)
+            self.chunk_done(chunk)
+        with section("db_write"):
+            self.delete_stale_lines()
+
+    def load_existing_lines(self, refs):
+        """Remember the stored lines of orders seen in the file for the first time."""
+        new_refs = [ref for ref in refs if ref not in self.existing_lines]
+        if not new_refs:
+            return
+        for ref in new_refs:
+            self.existing_lines[ref] = defaultdict(list)
+        stored = SalesOrderLines.objects.using(self.db).filter(order_reference__in=new_refs)
+        for ref, stored_hash, pk in stored.values_list("order_reference_id", "row_hash", "pk").iterator():
+            self.existing_lines[ref][stored_hash].append(pk)
+
+    def delete_stale_lines(self):
+        """
+        Remove stored lines of the imported orders that the file no longer has.
+
+        Orders in ``incomplete_orders`` are left alone: a line the file still
+        has but that was rejected or failed to write would look removed.
+        The deletes go through the ORM so post_delete still clears the cached
+        PDFs; order totals are refreshed here, as in ``write_lines``.
+        """
+        stale = (
+            (ref, pk)
+            for ref, hashes in self.existing_lines.items()
+            if ref not in self.incomplete_orders
+            for pks in hashes.values()
+            for pk in pks
+        )
+        for chunk in chunked(stale, self.chunk_size):
+            refs = {ref for ref, _ in chunk}
+            try:
+                with transaction.atomic(using=self.db):
+                    SalesOrderLines.objects.using(self.db).filter(pk__in=[pk for _, pk in chunk]).delete()
+                    SalesOrder.objects.using(self.db).filter(pk__in=refs).refresh_line_totals()
+            except DatabaseError as e:
+                self.report.add_error(LINES_SHEET, "-", e)
+                return
+            self.report.lines_deleted += len(chunk)
+        self.existing_lines = {}
+
+    def build_line(self, row_number, row, existing_orders):
+        values = self.row_values(LINE_COLUMNS, row)
+        order_reference = values.pop("order_reference")
+        # Margins are always derived from unit price and cost, never taken from the sheet.
+        del values["margin"], values["margin_percentage"]
+        if order_reference is None or str(order_reference) not in existing_orders:
+            self.report.add_error(LINES_SHEET, row_number, f"SalesOrder '{order_reference}' not found.")
+            return None
+
+        line = SalesOrderLines(order_reference_id=str(order_reference), **values)
+        try:
+            line.full_clean(
+                exclude=self.line_excluded_from_clean, validate_unique=False, validate_constraints=False
+            )
+        except ValidationError as e:
+            self.report.add_error(LINES_SHEET, row_number, format_errors(e))
+            self.incomplete_orders.add(line.order_reference_id)
+            return None
+        line.row_hash = row_hash(line)
+        return line
+
+    def write_lines(self, chunk, lines):
+        try:
+            with transaction.atomic(using=self.db):
+                # The totals are refreshed here, in the chunk's transaction, and
+                # the rollups once at the end, rather than after every chunk.
+                SalesOrderLines.objects.using(self.db).bulk_create(lines, refresh_orders=False)
+                refs = {line.order_reference_id for line in lines}
+                SalesOrder.objects.using(self.db).filter(pk__in=refs).refresh_line_totals()
+        except DatabaseError as e:
+            self.report.add_error(LINES_SHEET, f"{chunk[0][0]}-{chunk[-1][0]}", e)
+            self.incomplete_orders.update(line.order_reference_id for line in lines)
+            return
+        self.report.lines_imported += len(lines)
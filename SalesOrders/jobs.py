@@ -0,0 +1,128 @@
+import datetime
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .importer import MAX_REPORTED_ERRORS, OrderImporter
+from .models import ImportJob
+from .readers import SpreadsheetError, SpreadsheetSource
+from .timing import collect
+
+logger = logging.getLogger(__name__)
+
+# Jobs still running after this many seconds are taken to belong to a dead worker.
+IMPORT_JOB_TIMEOUT = 60 * 60
+
+
+def claim_next_job():
+    """
+    Mark the oldest pending job as running and return it, or None.
+
+    The conditional UPDATE makes claiming safe when several workers poll the
+    same table: only one of them can move a given job out of ``pending``.
+    """
+    for job_id in ImportJob.objects.filter(status=ImportJob.PENDING).order_by("created_at").values_list("pk", flat=True)[:5]:
+        claimed = ImportJob.objects.filter(pk=job_id, status=ImportJob.PENDING).update(
+            status=ImportJob.RUNNING, started_at=timezone.now()
+        )
+        if claimed:
+            return ImportJob.objects.get(pk=job_id)
+    return None
+
+
+def save_progress(job, report):
+    ImportJob.objects.filter(pk=job.pk).update(
+        rows_processed=report.rows_processed,
+        orders_imported=report.orders_imported,
+        lines_imported=report.lines_imported,
+        error_count=report.error_count,
+    )
+
+
+def run_job(job):
+    """Run one claimed import job to completion and record its outcome."""
+    with collect(f"import job {job.pk}") as timing:
+        import_job(job)
+    timing.log(job=job.pk)
+
+
+def import_job(job):
+    lines_file = job.lines_file if job.lines_file else None
+    try:
+        with ExitStack() as stack:
+            stack.enter_context(job.file.open("rb"))
+            if lines_file is not None:
+                stack.enter_context(lines_file.open("rb"))
+            source = stack.enter_context(SpreadsheetSource(job.file, lines_file))
+            ImportJob.objects.filter(pk=job.pk).update(total_rows=source.count_rows())
+            importer = OrderImporter(on_chunk=lambda report: save_progress(job, report))
+            report = importer.run(source.order_rows(), source.line_rows())
+    except SpreadsheetError as e:
+        finish_job(job, ImportJob.FAILED, str(e))
+        return
+    except Exception as e:
+        logger.exception("Import job %s failed", job.pk)
+        finish_job(job, ImportJob.FAILED, f"Import failed: {e}")
+        return
+
+    save_progress(job, report)
+    ImportJob.objects.filter(pk=job.pk).update(
+        errors=[list(error) for error in report.errors[:MAX_REPORTED_ERRORS]]
+    )
+    finish_job(job, ImportJob.DONE, report.summary())
+
+
+def finish_job(job, status, message):
+    ImportJob.objects.filter(pk=job.pk).update(
+        status=status, message=message, finished_at=timezone.now(), file="", lines_file=None
+    )
+    remove_uploads(job)
+
+
+def remove_uploads(job):
+    # Once a job has finished only its file_hash is needed (to spot repeated uploads).
+    for upload in (job.file, job.lines_file):
+        if upload:
+            upload.delete(save=False)
+
+
+def fail_stale_jobs(timeout=None):
+    """
+    Fail jobs that have been running for longer than ``timeout`` seconds
+    (``SALESORDERS_IMPORT_JOB_TIMEOUT`` by default); returns how many.
+
+    A worker that dies mid-import leaves its job ``running`` for good, so
+    workers call this when they start. The jobs are failed rather than
+    queued again, since a file that brought a worker down would only do so
+    again.
+    """
+    if timeout is None:
+        timeout = getattr(settings, "SALESORDERS_IMPORT_JOB_TIMEOUT", IMPORT_JOB_TIMEOUT)
+    cutoff = timezone.now() - datetime.timedelta(seconds=timeout)
+    count = 0
+    for job in ImportJob.objects.filter(status=ImportJob.RUNNING, started_at__lt=cutoff):
+        failed = ImportJob.objects.filter(pk=job.pk, status=ImportJob.RUNNING).update(
+            status=ImportJob.FAILED,
+            message="The import worker stopped before this import finished. Upload the file again.",
+            finished_at=timezone.now(),
+            file="",
+            lines_file=None,
+        )
+        if failed:
+            logger.warning("Import job %s was still running after %s seconds; marked as failed", job.pk, timeout)
+            remove_uploads(job)
+            count += 1
+    return count
+
+
+def run_pending_jobs():
+    """Run queued jobs until none are left; returns how many were run."""
+    count = 0
+    while (job := claim_next_job()) is not None:
+        close_old_connections()
+        run_job(job)
+        count += 1
+    return count
@@ -0,0 +1,58 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from SalesOrders.benchmark import Benchmark, compare
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the import, export, PDF, orders list and admin changelist/search views against the "
+        "current database, optionally comparing with a stored baseline. Changes are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario; the median is reported.")
+        parser.add_argument(
+            "--import-orders", type=int, default=1000, help="Orders in the workbook used by the import scenario."
+        )
+        parser.add_argument("--only", nargs="+", metavar="SCENARIO", help="Run only these scenarios.")
+        parser.add_argument("--output", help="Write the results as JSON to this path.")
+        parser.add_argument("--baseline", help="JSON results of an earlier run to compare against.")
+        parser.add_argument(
+            "--tolerance", type=float, default=0.2,
+            help="Allowed slowdown against the baseline, as a fraction (default 0.2 = 20%%).",
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["baseline"]:
+            try:
+                with open(options["baseline"]) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read baseline: {e}")
+
+        benchmark = Benchmark(repeat=max(options["repeat"], 1), import_orders=options["import_orders"])
+        results = benchmark.run(only=options["only"])
+
+        self.stdout.write(
+            f"{results['database']}: {results['orders']} orders, {results['lines']} lines, "
+            f"median of {results['repeat']} run(s)"
+        )
+        for name, result in results["scenarios"].items():
+            line = f"  {name:<22} {result['seconds'] * 1000:9.1f} ms {result['queries']:5} queries  HTTP {result['status']}"
+            before = (baseline or {}).get("scenarios", {}).get(name)
+            if before:
+                line += f"  (baseline {before['seconds'] * 1000:.1f} ms, {before['queries']} queries)"
+            self.stdout.write(line)
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
+
+        if baseline is not None:
+            regressions = compare(results, baseline, options["tolerance"])
+            if regressions:
+                raise CommandError("Regressions against the baseline:\n" + "\n".join(regressions))
+            self.stdout.write("No regressions against the baseline.")
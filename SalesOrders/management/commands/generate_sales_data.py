@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from SalesOrders.importer import OrderImporter
+from SalesOrders.synthetic import SyntheticSalesData
+
+
+class Command(BaseCommand):
+    help = "Generate synthetic sales orders as an import workbook, a CSV ZIP and/or rows in the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=10000, help="Number of orders to generate.")
+        parser.add_argument("--lines-per-order", type=int, default=5, help="Average number of lines per order.")
+        parser.add_argument("--seed", type=int, default=1, help="Random seed; the same seed gives the same data.")
+        parser.add_argument("--prefix", default="SYN", help="Order reference prefix.")
+        parser.add_argument("--days", type=int, default=730, help="Spread creation dates over this many days.")
+        parser.add_argument("--xlsx", help="Write an import workbook to this path.")
+        parser.add_argument("--zip", help="Write an import ZIP of two CSV files to this path.")
+        parser.add_argument("--load", action="store_true", help="Import the orders into the database.")
+
+    def handle(self, *args, **options):
+        if not (options["xlsx"] or options["zip"] or options["load"]):
+            raise CommandError("Nothing to do: give --xlsx, --zip and/or --load.")
+        if options["orders"] < 1 or options["lines_per_order"] < 1:
+            raise CommandError("--orders and --lines-per-order must be at least 1.")
+
+        data = SyntheticSalesData(
+            options["orders"],
+            lines_per_order=options["lines_per_order"],
+            seed=options["seed"],
+            prefix=options["prefix"],
+            days=options["days"],
+        )
+
+        if options["xlsx"]:
+            started = time.perf_counter()
+            data.write_xlsx(options["xlsx"])
+            self.stdout.write(f"Wrote {options['xlsx']} in {time.perf_counter() - started:.1f}s.")
+
+        if options["zip"]:
+            started = time.perf_counter()
+            with open(options["zip"], "wb") as target:
+                for chunk in data.zip_chunks():
+                    target.write(chunk)
+            self.stdout.write(f"Wrote {options['zip']} in {time.perf_counter() - started:.1f}s.")
+
+        if options["load"]:
+            started = time.perf_counter()
+            report = OrderImporter().run(data.order_rows(), data.line_rows())
+            self.stdout.write(f"{report.summary()} ({time.perf_counter() - started:.1f}s)")
+            if report.error_count:
+                self.stdout.write(report.error_summary())
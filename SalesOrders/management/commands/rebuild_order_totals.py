@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from SalesOrders.models import SalesOrder
+
+
+class Command(BaseCommand):
+    help = "Recompute the line count, revenue, cost and margin stored on every sales order."
+
+    def handle(self, *args, **options):
+        updated = SalesOrder.objects.refresh_line_totals()
+        self.stdout.write(f"Refreshed line totals of {updated} order(s).")
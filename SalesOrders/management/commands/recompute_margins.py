@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+
+from SalesOrders.models import SalesOrderLines
+
+
+class Command(BaseCommand):
+    help = "Recompute margin and margin percentage of every order line with set-based UPDATEs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=100000,
+            help="Lines per UPDATE, as a range of primary keys; keeps each transaction short.",
+        )
+
+    def handle(self, *args, **options):
+        bounds = SalesOrderLines.objects.aggregate(first=Min("pk"), last=Max("pk"))
+        if bounds["first"] is None:
+            self.stdout.write("No order lines to update.")
+            return
+
+        batch_size = max(options["batch_size"], 1)
+        updated = 0
+        for start in range(bounds["first"], bounds["last"] + 1, batch_size):
+            lines = SalesOrderLines.objects.filter(pk__gte=start, pk__lt=start + batch_size)
+            updated += lines.recompute_margins()
+        self.stdout.write(f"Recomputed margins of {updated} order line(s).")
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from SalesOrders.rollups import rebuild_rollups, refresh_periods
+
+
+class Command(BaseCommand):
+    help = "Rebuild the monthly sales rollups read by the dashboard."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "months", nargs="*", metavar="YYYY-MM",
+            help="Months to refresh. Without any, every rollup is rebuilt from scratch.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["months"]:
+            count = rebuild_rollups()
+            self.stdout.write(f"Rebuilt {count} rollup row(s).")
+            return
+
+        periods = []
+        for month in options["months"]:
+            try:
+                period = parse_date(f"{month}-01")
+            except ValueError:
+                period = None
+            if period is None:
+                raise CommandError(f"Invalid month '{month}', use YYYY-MM.")
+            periods.append(period)
+        count = refresh_periods(periods)
+        self.stdout.write(f"Refreshed {len(periods)} month(s): {count} rollup row(s).")
@@ -0,0 +1,56 @@
+import os
+import time
+import zipfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from SalesOrders.models import SalesOrder
+from SalesOrders.pdf import render_order_pdfs
+
+
+class Command(BaseCommand):
+    help = "Render the PDFs of many sales orders in parallel and write them to a ZIP file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="Path of the ZIP file to write.")
+        parser.add_argument("--status", help="Only orders with this status, e.g. Confirmed.")
+        parser.add_argument("--from", dest="date_from", help="Only orders created on or after YYYY-MM-DD.")
+        parser.add_argument("--to", dest="date_to", help="Only orders created on or before YYYY-MM-DD.")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Render processes to use.")
+        parser.add_argument(
+            "--compare", action="store_true",
+            help="Also render with a single worker first and report the throughput of both runs.",
+        )
+        parser.add_argument("--no-cache", action="store_true", help="Re-render PDFs even if they are cached.")
+
+    def handle(self, *args, **options):
+        orders = SalesOrder.objects.order_by("order_reference")
+        if options["status"]:
+            orders = orders.filter(status=options["status"])
+        for option, lookup in (("date_from", "creation_date__gte"), ("date_to", "creation_date__lte")):
+            if options[option]:
+                value = parse_date(options[option])
+                if value is None:
+                    raise CommandError(f"Invalid date '{options[option]}', use YYYY-MM-DD.")
+                orders = orders.filter(**{lookup: value})
+
+        use_cache = not options["no_cache"]
+        if options["compare"]:
+            # Rendering the same orders twice must not be served from the cache.
+            use_cache = False
+            self.report(1, *self.render(orders, 1, os.devnull, use_cache))
+        self.report(options["workers"], *self.render(orders, options["workers"], options["output"], use_cache))
+
+    def render(self, orders, workers, output, use_cache):
+        started = time.perf_counter()
+        count = 0
+        with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_STORED) as archive:
+            for filename, pdf in render_order_pdfs(orders, workers=workers, use_cache=use_cache):
+                archive.writestr(filename, pdf)
+                count += 1
+        return count, time.perf_counter() - started
+
+    def report(self, workers, count, elapsed):
+        rate = count / elapsed if elapsed else 0
+        self.stdout.write(f"{workers} worker(s): {count} PDFs in {elapsed:.1f}s ({rate:.1f} PDFs/s)")
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from SalesOrders.jobs import fail_stale_jobs, run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued sales order imports, polling the ImportJob table for new uploads."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds to wait between polls.")
+        parser.add_argument("--once", action="store_true", help="Run pending jobs once and exit.")
+        parser.add_argument(
+            "--job-timeout", type=int, default=None,
+            help="Fail jobs left running longer than this many seconds (default: SALESORDERS_IMPORT_JOB_TIMEOUT).",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Import worker started.")
+        stale = fail_stale_jobs(options["job_timeout"])
+        if stale:
+            self.stdout.write(f"Marked {stale} interrupted import job(s) as failed.")
+        while True:
+            count = run_pending_jobs()
+            if count:
+                self.stdout.write(f"Finished {count} import job(s).")
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,69 @@
+import json
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from SalesOrders.changes import CHANGE_BATCH_SIZE, CHANGE_FEEDS
+from SalesOrders.pagination import InvalidCursor
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the orders, order lines and deletions changed since the last run as NDJSON, "
+        "keeping the cursors in a state file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--state", required=True, help="JSON file holding the cursor of each feed between runs.")
+        parser.add_argument("--output", default="-", help="NDJSON output path; '-' (the default) is stdout.")
+        parser.add_argument(
+            "--kind", nargs="+", choices=list(CHANGE_FEEDS), default=list(CHANGE_FEEDS),
+            help="Feeds to read (default: all).",
+        )
+        parser.add_argument("--batch-size", type=int, default=CHANGE_BATCH_SIZE, help="Rows fetched per query.")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        state = self.read_state(options["state"])
+        to_stdout = options["output"] == "-"
+        target = sys.stdout if to_stdout else open(options["output"], "w", encoding="utf-8")
+        encoder = DjangoJSONEncoder()
+        counts = {}
+
+        try:
+            for kind in options["kind"]:
+                counts[kind] = 0
+                try:
+                    for rows, cursor in CHANGE_FEEDS[kind].batches(state.get(kind), options["batch_size"]):
+                        target.write("".join(encoder.encode({"kind": kind, "row": row}) + "\n" for row in rows))
+                        counts[kind] += len(rows)
+                        state[kind] = cursor
+                except InvalidCursor:
+                    raise CommandError(f"Invalid {kind} cursor in {options['state']}.")
+            target.flush()
+        finally:
+            if not to_stdout:
+                target.close()
+
+        # Only once everything has been written, so a failed run is simply repeated.
+        self.write_state(options["state"], state)
+        summary = ", ".join(f"{count} {kind}" for kind, count in counts.items())
+        (self.stderr if to_stdout else self.stdout).write(f"Synced {summary}.")
+
+    def read_state(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read state file: {e}")
+
+    def write_state(self, path, state):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp, path)
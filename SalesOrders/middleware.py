@@ -0,0 +1,65 @@
+import threading
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .timing import collect, profiler, top_stacks
+
+
+class PerformanceMiddleware:
+    """
+    Time every request: SQL queries, repeated statements and named sections.
+
+    Adds a ``Server-Timing`` header (shown in the browser's network panel)
+    for staff users and in DEBUG, and logs one JSON line per request to the
+    ``SalesOrders.performance`` logger. With
+    ``SALESORDERS_PROFILE_THRESHOLD_MS`` set, synchronous requests are also
+    sampled and the hottest stacks of those slower than the threshold are
+    logged.
+
+    Streamed bodies (CSV/ZIP exports, the NDJSON API) are produced after the
+    response leaves the middleware, so only the time to the first byte is
+    measured for them.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.profile_threshold = getattr(settings, "SALESORDERS_PROFILE_THRESHOLD_MS", None)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        thread_id = threading.get_ident()
+        if self.profile_threshold is not None:
+            profiler.start(thread_id)
+        samples = None
+        try:
+            with collect(request.path) as timing:
+                response = self.get_response(request)
+        finally:
+            if self.profile_threshold is not None:
+                samples = profiler.stop(thread_id)
+        is_staff = settings.DEBUG or getattr(getattr(request, "user", None), "is_staff", False)
+        return self.process_timing(request, response, timing, is_staff, samples)
+
+    async def __acall__(self, request):
+        with collect(request.path) as timing:
+            response = await self.get_response(request)
+        # request.user would load the user synchronously, which is not allowed here.
+        user = await request.auser() if not settings.DEBUG and hasattr(request, "auser") else None
+        is_staff = settings.DEBUG or getattr(user, "is_staff", False)
+        return self.process_timing(request, response, timing, is_staff)
+
+    def process_timing(self, request, response, timing, is_staff, samples=None):
+        if is_staff:
+            response["Server-Timing"] = timing.server_timing()
+        extra = {"method": request.method, "status": response.status_code}
+        if samples and timing.duration * 1000 >= self.profile_threshold:
+            extra["profile"] = top_stacks(samples, interval=profiler.interval)
+        timing.log(**extra)
+        return response
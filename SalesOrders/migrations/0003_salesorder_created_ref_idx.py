@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SalesOrders', '0002_importjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='salesorder',
+            index=models.Index(fields=['creation_date', 'order_reference'], name='salesorder_created_ref_idx'),
+        ),
+    ]
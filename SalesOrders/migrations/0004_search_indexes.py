@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:30
+
+from django.db import migrations, models
+
+from SalesOrders.search import search_index
+
+
+def create_search_index(apps, schema_editor):
+    # The full-text index is PostgreSQL only; SQLite gets an FTS5 table
+    # after migrate instead (see SalesOrders.signals).
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.add_index(apps.get_model("SalesOrders", "SalesOrder"), search_index())
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.remove_index(apps.get_model("SalesOrders", "SalesOrder"), search_index())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SalesOrders', '0003_salesorder_created_ref_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='salesorder',
+            name='customer',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='salesorder',
+            name='salesperson',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='salesorder',
+            name='status',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='salesorder',
+            name='total',
+            field=models.DecimalField(db_index=True, decimal_places=2, max_digits=12),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations, models
+from django.db.models.functions import Upper
+
+
+def autocomplete_indexes():
+    from django.contrib.postgres.indexes import OpClass
+
+    # LIKE 'abc%' can only use a btree index built with pattern operators
+    # when the database collation is not "C".
+    return [
+        models.Index(OpClass("order_reference", name="varchar_pattern_ops"), name="salesorder_ref_prefix_idx"),
+        models.Index(OpClass(Upper("customer"), name="text_pattern_ops"), name="salesorder_cust_prefix_idx"),
+    ]
+
+
+def create_autocomplete_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        model = apps.get_model("SalesOrders", "SalesOrder")
+        for index in autocomplete_indexes():
+            schema_editor.add_index(model, index)
+
+
+def drop_autocomplete_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        model = apps.get_model("SalesOrders", "SalesOrder")
+        for index in autocomplete_indexes():
+            schema_editor.remove_index(model, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SalesOrders', '0004_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_autocomplete_indexes, drop_autocomplete_indexes),
+    ]
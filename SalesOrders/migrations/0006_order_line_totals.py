@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:32
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_line_totals(apps, schema_editor):
+    SalesOrder = apps.get_model("SalesOrders", "SalesOrder")
+    SalesOrderLines = apps.get_model("SalesOrders", "SalesOrderLines")
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+    lines = SalesOrderLines.objects.filter(order_reference=OuterRef("pk")).order_by().values("order_reference")
+
+    def line_sum(expression):
+        total = lines.annotate(value=Sum(expression, output_field=amount)).values("value")
+        return Coalesce(Subquery(total, output_field=amount), Decimal("0"), output_field=amount)
+
+    SalesOrder.objects.update(
+        line_count=Coalesce(Subquery(lines.annotate(value=Count("pk")).values("value")), 0),
+        lines_revenue=line_sum(F("quantity") * F("unit_price")),
+        lines_cost=line_sum(F("quantity") * F("cost")),
+        lines_margin=line_sum(F("quantity") * (F("unit_price") - F("cost"))),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SalesOrders', '0005_autocomplete_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesorder',
+            name='line_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='salesorder',
+            name='lines_cost',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='salesorder',
+            name='lines_margin',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='salesorder',
+            name='lines_revenue',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.RunPython(fill_line_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:36
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def fill_rollups(apps, schema_editor):
+    SalesOrder = apps.get_model("SalesOrders", "SalesOrder")
+    SalesRollup = apps.get_model("SalesOrders", "SalesRollup")
+    rows = (
+        SalesOrder.objects.order_by()
+        .annotate(period=TruncMonth("creation_date"))
+        .values("period", "salesperson", "customer", "currency", "status")
+        .annotate(
+            order_count=Count("pk"),
+            orders_total=Sum("total"),
+            line_count=Sum("line_count"),
+            revenue=Sum("lines_revenue"),
+            cost=Sum("lines_cost"),
+            margin=Sum("lines_margin"),
+        )
+    )
+    SalesRollup.objects.bulk_create((SalesRollup(**row) for row in rows.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SalesOrders', '0006_order_line_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(help_text='First day of the month.')),
+                ('salesperson', models.CharField(max_length=255)),
+                ('customer', models.CharField(max_length=255)),
+                ('currency', models.CharField(max_length=20)),
+                ('status', models.CharField(max_length=100)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('orders_total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('line_count', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('margin', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['currency', 'period'], name='salesrollup_currency_idx')],
+                'constraints': [models.UniqueConstraint(fields=('period', 'salesperson', 'customer', 'currency', 'status'), name='salesrollup_unique_key')],
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:24
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def clear_rollups(apps, schema_editor):
+    # The old rows would collide on the narrower key; they are rebuilt below.
+    apps.get_model("SalesOrders", "SalesRollup").objects.all().delete()
+
+
+def fill_rollups(apps, schema_editor):
+    SalesOrder = apps.get_model("SalesOrders", "SalesOrder")
+    dimensions = {
+        "SalesRollup": ["salesperson", "currency", "status"],
+        "CustomerRollup": ["customer", "currency"],
+    }
+    for model_name, fields in dimensions.items():
+        model = apps.get_model("SalesOrders", model_name)
+        rows = (
+            SalesOrder.objects.order_by()
+            .annotate(period=TruncMonth("creation_date"))
+            .values("period", *fields)
+            .annotate(
+                order_count=Count("pk"),
+                orders_total=Sum("total"),
+                line_count=Sum("line_count"),
+                revenue=Sum("lines_revenue"),
+                cost=Sum("lines_cost"),
+                margin=Sum("lines_margin"),
+            )
+        )
+        model.objects.bulk_create((model(**row) for row in rows.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SalesOrders', '0009_change_feed'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_rollups, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='CustomerRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(help_text='First day of the month.')),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('orders_total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('line_count', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('margin', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('customer', models.CharField(max_length=255)),
+                ('currency', models.CharField(max_length=20)),
+            ],
+        ),
+        migrations.RemoveConstraint(
+            model_name='salesrollup',
+            name='salesrollup_unique_key',
+        ),
+        migrations.RemoveField(
+            model_name='salesrollup',
+            name='customer',
+        ),
+        migrations.AddConstraint(
+            model_name='salesrollup',
+            constraint=models.UniqueConstraint(fields=('period', 'salesperson', 'currency', 'status'), name='salesrollup_unique_key'),
+        ),
+        migrations.AddIndex(
+            model_name='customerrollup',
+            index=models.Index(fields=['currency', 'period'], name='customerrollup_currency_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='customerrollup',
+            constraint=models.UniqueConstraint(fields=('period', 'customer', 'currency'), name='customerrollup_unique_key'),
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
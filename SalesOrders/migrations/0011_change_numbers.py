@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+def create_counter(apps, schema_editor):
+    apps.get_model("SalesOrders", "ChangeCounter").objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SalesOrders', '0010_rekey_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_counter, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='salesorderlines',
+            name='salesorderlines_updated_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='tombstone',
+            name='tombstone_deleted_id_idx',
+        ),
+        migrations.AddField(
+            model_name='salesorder',
+            name='change_number',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='salesorderlines',
+            name='change_number',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='change_number',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='salesorder',
+            index=models.Index(fields=['change_number', 'order_reference'], name='salesorder_change_ref_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salesorderlines',
+            index=models.Index(fields=['change_number', 'id'], name='salesorderlines_change_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['change_number', 'id'], name='tombstone_change_id_idx'),
+        ),
+    ]
@@ -1,13 +1,320 @@
-from django.db import models
+import hashlib
+from decimal import ROUND_HALF_UP, Decimal
+from functools import lru_cache
 
-class SalesOrder(models.Model):
+from django.conf import settings
+from django.db import models, router, transaction
+from django.db.models import Case, Count, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Round
+from django.db.models.lookups import Exact
+from django.dispatch import Signal
+from django.utils import timezone
+
+AMOUNT = models.DecimalField(max_digits=14, decimal_places=2)
+CENT = Decimal("0.01")
+# Written with decimals so SQLite does not fall back to integer division.
+HUNDRED = Decimal("100.00")
+
+
+@lru_cache(maxsize=None)
+def row_hash_fields(model):
+    """Columns covered by ``row_hash``: what an import writes, minus derived values."""
+    derived = getattr(model, "derived_fields", ())
+    return [
+        field for field in model._meta.concrete_fields
+        if field.editable and not field.auto_created and field.name not in derived
+    ]
+
+
+def row_hash(instance):
+    """
+    Fingerprint of an instance's imported columns.
+
+    Values are normalised through their fields first (decimals to their
+    column's scale), so a row read back from a spreadsheet and the same row
+    saved from the admin hash the same.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for field in row_hash_fields(type(instance)):
+        value = field.to_python(getattr(instance, field.attname))
+        if isinstance(value, Decimal):
+            value = value.quantize(Decimal(1).scaleb(-field.decimal_places))
+        digest.update(("" if value is None else str(value)).encode("utf-8") + b"\x1f")
+    return digest.hexdigest()
+
+
+# Row timestamps and change numbers, maintained on every write path.
+CHANGE_TRACKING_FIELDS = ("created_at", "updated_at", "change_number")
+
+
+class ChangeCounter(models.Model):
+    """
+    The single row that numbers writes to orders, lines and tombstones.
+
+    Taking a number updates this row, which then stays locked until the
+    writing transaction ends. Number n + 1 cannot be taken before the
+    transaction holding n has committed or rolled back, so numbers become
+    visible in commit order and the change feed's cursor never passes a
+    change that is still to commit. The cost is that writes to orders and
+    lines take turns, from their first write to their commit.
+    """
+
+    value = models.BigIntegerField(default=0)
+
+
+def next_change_number(using):
+    """Take the next change number, inside the writing transaction and before its first row write."""
+    counter = ChangeCounter.objects.using(using).filter(pk=1)
+    if not counter.update(value=F("value") + 1):
+        ChangeCounter.objects.using(using).get_or_create(pk=1)
+        counter.update(value=F("value") + 1)
+    return counter.values_list("value", flat=True).get()
+
+
+def last_change_number():
+    """The highest change number committed so far; every change up to it is visible."""
+    return ChangeCounter.objects.filter(pk=1).values_list("value", flat=True).first() or 0
+
+
+class ChangeNumbered(models.Model):
+    """A model whose saves record a ``change_number`` for the change feed."""
+
+    change_number = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            self.change_number = next_change_number(using)
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "change_number"}
+            super().save(*args, **kwargs)
+
+
+class ChangeTrackingQuerySet(models.QuerySet):
+    """
+    Sets ``updated_at`` and ``change_number`` on the bulk write paths, which
+    skip ``save()``.
+
+    ``bulk_create()`` fills ``auto_now`` fields by itself, but an upsert
+    only writes the ``update_fields`` it is given, and ``bulk_update()``
+    and ``update()`` never touch them.
+    """
+
+    def write_db(self):
+        self._for_write = True
+        return self.db
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        update_fields = kwargs.get("update_fields")
+        if kwargs.get("update_conflicts") and update_fields:
+            kwargs["update_fields"] = [
+                *update_fields, *(name for name in ("updated_at", "change_number") if name not in update_fields)
+            ]
+        if not objs:
+            return super().bulk_create(objs, *args, **kwargs)
+        using = self.write_db()
+        with transaction.atomic(using=using, savepoint=False):
+            number = next_change_number(using)
+            for obj in objs:
+                obj.change_number = number
+            return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        fields = list(fields)
+        fields += [name for name in ("updated_at", "change_number") if name not in fields]
+        if not objs:
+            return super().bulk_update(objs, fields, *args, **kwargs)
+        now = timezone.now()
+        using = self.write_db()
+        with transaction.atomic(using=using, savepoint=False):
+            number = next_change_number(using)
+            for obj in objs:
+                obj.updated_at = now
+                obj.change_number = number
+            return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def update(self, **kwargs):
+        kwargs.setdefault("updated_at", timezone.now())
+        using = self.write_db()
+        with transaction.atomic(using=using, savepoint=False):
+            kwargs["change_number"] = next_change_number(using)
+            return super().update(**kwargs)
+
+
+class RowHashQuerySet(ChangeTrackingQuerySet):
+    """
+    Keeps ``row_hash`` in step on the bulk write paths, which skip ``save()``.
+
+    ``update()`` cannot compute the new hash in SQL, so it clears it; the
+    next import then rewrites those rows instead of skipping them.
+    """
+
+    def hashed_names(self):
+        return {field.name for field in row_hash_fields(self.model)} | {
+            field.attname for field in row_hash_fields(self.model)
+        }
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            if not obj.row_hash:
+                obj.row_hash = row_hash(obj)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        fields = list(fields)
+        if self.hashed_names().intersection(fields):
+            for obj in objs:
+                obj.row_hash = row_hash(obj)
+            if "row_hash" not in fields:
+                fields.append("row_hash")
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def update(self, **kwargs):
+        if self.hashed_names().intersection(kwargs):
+            kwargs.setdefault("row_hash", "")
+        return super().update(**kwargs)
+
+
+class SalesOrderQuerySet(RowHashQuerySet):
+    def refresh_line_totals(self):
+        """
+        Recompute the line aggregates of these orders in a single UPDATE.
+
+        Each column is a correlated subquery over the order's lines, so the
+        database does the work set-based whether this covers one order or
+        the whole table.
+        """
+        lines = SalesOrderLines.objects.filter(order_reference=OuterRef("pk")).order_by().values("order_reference")
+
+        def line_sum(expression):
+            total = lines.annotate(value=Sum(expression, output_field=AMOUNT)).values("value")
+            return Coalesce(Subquery(total, output_field=AMOUNT), Decimal("0"), output_field=AMOUNT)
+
+        return self.update(
+            line_count=Coalesce(Subquery(lines.annotate(value=Count("pk")).values("value")), 0),
+            lines_revenue=line_sum(F("quantity") * F("unit_price")),
+            lines_cost=line_sum(F("quantity") * F("cost")),
+            lines_margin=line_sum(F("quantity") * (F("unit_price") - F("cost"))),
+        )
+
+
+def as_expression(value, field):
+    if hasattr(value, "resolve_expression"):
+        return value
+    return Value(value, output_field=field)
+
+
+def margin_expressions(unit_price=F("unit_price"), cost=F("cost")):
+    """
+    SQL expressions for ``margin`` and ``margin_percentage``.
+
+    The same rule as ``SalesOrderLines.compute_margin()``. ``unit_price`` and
+    ``cost`` default to the row's columns; pass the new values when they are
+    being updated in the same statement, since the right-hand side of an
+    UPDATE sees the old ones. Plain values are accepted as well as
+    expressions.
+    """
+    unit_price = as_expression(unit_price, SalesOrderLines._meta.get_field("unit_price"))
+    cost = as_expression(cost, SalesOrderLines._meta.get_field("cost"))
+    margin = models.ExpressionWrapper(unit_price - cost, output_field=SalesOrderLines._meta.get_field("margin"))
+    percentage = Case(
+        When(Exact(unit_price, 0), then=Value(None)),
+        default=Round(margin * HUNDRED / unit_price, 2),
+        output_field=SalesOrderLines._meta.get_field("margin_percentage"),
+    )
+    return {"margin": margin, "margin_percentage": percentage}
+
+
+def compute_margins(lines):
+    """Set ``margin`` and ``margin_percentage`` on many unsaved lines at once."""
+    for line in lines:
+        line.compute_margin()
+    return lines
+
+
+# Sent with the affected ``order_pks`` after a bulk write to order lines, which
+# sends no post_save; the receiver refreshes the order totals and rollups.
+order_lines_changed = Signal()
+
+
+class SalesOrderLinesQuerySet(RowHashQuerySet):
+    """
+    Keeps margins and the order aggregates consistent on the bulk write
+    paths, which skip ``save()``.
+
+    ``bulk_create()`` and ``bulk_update()`` take ``refresh_orders=False``
+    for callers that refresh the order totals themselves, like the importer.
+    """
+
+    margin_sources = {"unit_price", "cost"}
+    total_sources = {"order_reference", "order_reference_id", "quantity", "unit_price", "cost"}
+
+    def bulk_create(self, objs, *args, refresh_orders=True, **kwargs):
+        objs = super().bulk_create(compute_margins(list(objs)), *args, **kwargs)
+        if refresh_orders:
+            self.orders_changed({obj.order_reference_id for obj in objs})
+        return objs
+
+    def bulk_update(self, objs, fields, *args, refresh_orders=True, **kwargs):
+        objs = list(objs)
+        fields = list(fields)
+        if self.margin_sources.intersection(fields):
+            compute_margins(objs)
+            fields += [name for name in ("margin", "margin_percentage") if name not in fields]
+        refresh_orders = refresh_orders and self.total_sources.intersection(fields)
+        if refresh_orders:
+            # Lines moved to another order leave their old one to refresh too.
+            order_pks = set(self.order_pks(self.filter(pk__in=[obj.pk for obj in objs])))
+        updated = super().bulk_update(objs, fields, *args, **kwargs)
+        if refresh_orders:
+            self.orders_changed(order_pks | {obj.order_reference_id for obj in objs})
+        return updated
+
+    def update(self, **kwargs):
+        if self.margin_sources.intersection(kwargs):
+            kwargs.update(margin_expressions(
+                unit_price=kwargs.get("unit_price", F("unit_price")),
+                cost=kwargs.get("cost", F("cost")),
+            ))
+        if not self.total_sources.intersection(kwargs):
+            return super().update(**kwargs)
+        order_pks = set(self.order_pks(self))
+        updated = super().update(**kwargs)
+        target = kwargs.get("order_reference", kwargs.get("order_reference_id"))
+        if isinstance(target, SalesOrder):
+            order_pks.add(target.pk)
+        elif isinstance(target, str):
+            order_pks.add(target)
+        self.orders_changed(order_pks)
+        return updated
+
+    def order_pks(self, lines):
+        return lines.order_by().values_list("order_reference_id", flat=True).distinct()
+
+    def orders_changed(self, order_pks):
+        if order_pks:
+            order_lines_changed.send(sender=self.model, order_pks=order_pks, using=self.db)
+
+    def recompute_margins(self):
+        """Recompute the margins of these lines in a single UPDATE."""
+        return super().update(**margin_expressions())
+
+
+class SalesOrder(ChangeNumbered):
     creation_date = models.DateField()
-    customer = models.CharField(max_length=255)
+    customer = models.CharField(max_length=255, db_index=True)
     currency = models.CharField(max_length=20)
     order_reference = models.CharField(max_length=100, primary_key=True)
-    salesperson = models.CharField(max_length=255)
-    status = models.CharField(max_length=100)
-    total = models.DecimalField(max_digits=12, decimal_places=2)
+    salesperson = models.CharField(max_length=255, db_index=True)
+    status = models.CharField(max_length=100, db_index=True)
+    total = models.DecimalField(max_digits=12, decimal_places=2, db_index=True)
 
     # Optional fields
     primary_contact = models.CharField(max_length=50, blank=True, null=True)
@@ -25,11 +332,49 @@ class SalesOrder(models.Model):
     lpo_number = models.CharField(max_length=100, blank=True, null=True)
     comments = models.TextField(blank=True, null=True)
 
+    # Aggregates of order_lines, maintained by SalesOrderQuerySet.refresh_line_totals()
+    line_count = models.PositiveIntegerField(default=0, editable=False)
+    lines_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+    lines_cost = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+    lines_margin = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+
+    # Fingerprint of the imported columns; lets a re-import skip unchanged rows
+    row_hash = models.CharField(max_length=32, blank=True, default="", editable=False)
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = SalesOrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the orders list seeks on this pair; it also
+            # serves filters and searches on creation_date alone.
+            models.Index(fields=["creation_date", "order_reference"], name="salesorder_created_ref_idx"),
+            # The change feed's cursor
+            models.Index(fields=["change_number", "order_reference"], name="salesorder_change_ref_idx"),
+            # Exports of the orders changed since a date
+            models.Index(fields=["updated_at", "order_reference"], name="salesorder_updated_ref_idx"),
+        ]
+
     def __str__(self):
         return f"{self.order_reference} - {self.customer}"
 
+    def save(self, *args, **kwargs):
+        self.row_hash = row_hash(self)
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "row_hash", "updated_at"}
+        super().save(*args, **kwargs)
 
-class SalesOrderLines(models.Model):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets the rollup signal handler refresh the month an order moved out of.
+        instance._loaded_creation_date = instance.__dict__.get("creation_date")
+        return instance
+
+
+class SalesOrderLines(ChangeNumbered):
     order_reference = models.ForeignKey(SalesOrder, on_delete=models.CASCADE, related_name='order_lines')
     product = models.CharField(max_length=255)
     quantity = models.PositiveIntegerField()
@@ -37,13 +382,189 @@ class SalesOrderLines(models.Model):
     cost = models.DecimalField(max_digits=10, decimal_places=2)
     margin = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
     margin_percentage = models.DecimalField(max_digits=7, decimal_places=2, blank=True, null=True)
+    row_hash = models.CharField(max_length=32, blank=True, default="", editable=False)
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = SalesOrderLinesQuerySet.as_manager()
+    derived_fields = ("margin", "margin_percentage")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["change_number", "id"], name="salesorderlines_change_id_idx"),
+        ]
+
+    def compute_margin(self):
+        if self.unit_price is None or self.cost is None:
+            return
+        unit_price = self._meta.get_field("unit_price").to_python(self.unit_price)
+        cost = self._meta.get_field("cost").to_python(self.cost)
+        self.margin = unit_price - cost
+        if unit_price:
+            self.margin_percentage = (self.margin * 100 / unit_price).quantize(CENT, ROUND_HALF_UP)
+        else:
+            self.margin_percentage = None
 
     def save(self, *args, **kwargs):
-        if self.unit_price and self.cost:
-            self.margin = self.unit_price - self.cost
-            if self.unit_price != 0:
-                self.margin_percentage = (self.margin / self.unit_price) * 100
+        self.compute_margin()
+        self.row_hash = row_hash(self)
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "row_hash", "updated_at"}
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.product} ({self.order_reference})"
+
+
+class Tombstone(ChangeNumbered):
+    """
+    A deleted order or order line, kept so the change feed can report deletions.
+
+    Written by the pre_delete signal handlers, in the deleting transaction
+    and before its rows are deleted, so the change number is taken first.
+    Deleting an order records only the order: its lines went with it.
+    """
+
+    ORDER = "order"
+    LINE = "line"
+    KIND_CHOICES = [
+        (ORDER, "Sales order"),
+        (LINE, "Order line"),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_pk = models.CharField(max_length=100)
+    order_reference = models.CharField(max_length=100)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["change_number", "id"], name="tombstone_change_id_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.object_pk} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
+
+
+class ImportJob(models.Model):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    file = models.FileField(upload_to="imports/")
+    lines_file = models.FileField(upload_to="imports/", blank=True, null=True)
+    # SHA-256 of the uploaded file(s), to recognise a repeated upload
+    file_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING, db_index=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    # Progress, updated by the worker after every chunk
+    total_rows = models.PositiveIntegerField(blank=True, null=True)
+    rows_processed = models.PositiveIntegerField(default=0)
+    orders_imported = models.PositiveIntegerField(default=0)
+    lines_imported = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    message = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Import #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+    @property
+    def progress_percent(self):
+        if self.status == self.DONE:
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(100, int(self.rows_processed * 100 / self.total_rows))
+
+    @property
+    def rows_per_second(self):
+        if not self.started_at:
+            return 0
+        elapsed = ((self.finished_at or timezone.now()) - self.started_at).total_seconds()
+        return round(self.rows_processed / elapsed, 1) if elapsed > 0 else 0
+
+
+class RollupMeasures(models.Model):
+    """The order totals summed up by the rollup tables."""
+
+    period = models.DateField(help_text="First day of the month.")
+
+    order_count = models.PositiveIntegerField(default=0)
+    orders_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    line_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    cost = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    margin = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        abstract = True
+
+
+class SalesRollup(RollupMeasures):
+    """
+    Monthly order totals per salesperson, currency and status.
+
+    Rebuilt one month at a time by ``SalesOrders.rollups.refresh_periods()``
+    whenever orders or lines in that month change; the dashboard reads only
+    from the rollup tables. Its size follows the number of salespeople and
+    statuses, not the number of orders.
+    """
+
+    salesperson = models.CharField(max_length=255)
+    currency = models.CharField(max_length=20)
+    status = models.CharField(max_length=100)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["period", "salesperson", "currency", "status"], name="salesrollup_unique_key"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["currency", "period"], name="salesrollup_currency_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.period:%Y-%m} {self.salesperson} ({self.currency}, {self.status})"
+
+
+class CustomerRollup(RollupMeasures):
+    """
+    Monthly order totals per customer and currency, for the dashboard's
+    top customers. Kept apart from SalesRollup so customers do not multiply
+    its rows.
+    """
+
+    customer = models.CharField(max_length=255)
+    currency = models.CharField(max_length=20)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["period", "customer", "currency"], name="customerrollup_unique_key"),
+        ]
+        indexes = [
+            models.Index(fields=["currency", "period"], name="customerrollup_currency_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.period:%Y-%m} {self.customer} ({self.currency})"
@@ -0,0 +1,177 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+ESTIMATED_COUNT_THRESHOLD = 100000
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(values):
+    data = json.dumps([str(value) for value in values]).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, fields):
+    """
+    Decode ``cursor`` into one value per model field in ``fields``.
+
+    Raises InvalidCursor if it is malformed or a value is not valid for its
+    field, so a tampered cursor is a bad request rather than a server error.
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(data)
+    except (ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise InvalidCursor(cursor)
+    try:
+        return [field.to_python(value) for field, value in zip(fields, values)]
+    except (ValidationError, TypeError, ValueError):
+        raise InvalidCursor(cursor)
+
+
+def seek_filter(keys, values, forward):
+    """
+    Build ``(k1, k2, ...) > (v1, v2, ...)`` (or ``<``) as OR-ed Q objects.
+
+    Written out instead of as a row comparison so it works on every backend
+    while still letting the database use the composite index on ``keys``.
+    """
+    lookup = "gt" if forward else "lt"
+    condition = Q()
+    for position, key in enumerate(keys):
+        clause = Q(**{f"{key}__{lookup}": values[position]})
+        for earlier, earlier_key in enumerate(keys[:position]):
+            clause &= Q(**{earlier_key: values[earlier]})
+        condition |= clause
+    return condition
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator:
+    """
+    Seek pagination over a unique, ordered tuple of columns.
+
+    Each page is fetched with ``WHERE keys > cursor ORDER BY keys LIMIT n``,
+    so the cost of a page does not depend on how deep into the table it is,
+    unlike OFFSET pagination. Cursors are opaque strings holding the key
+    values of the first or last row on the current page.
+    """
+
+    def __init__(self, queryset, keys, per_page=50, descending=False):
+        self.queryset = queryset
+        self.keys = list(keys)
+        self.key_fields = [queryset.model._meta.get_field(key) for key in self.keys]
+        self.per_page = per_page
+        self.descending = descending
+
+    def ordered(self, reverse):
+        prefix = "-" if self.descending != reverse else ""
+        return self.queryset.order_by(*[prefix + key for key in self.keys])
+
+    def cursor_for(self, obj):
+        return encode_cursor([getattr(obj, key) for key in self.keys])
+
+    def page(self, after=None, before=None):
+        """Return the page after cursor ``after``, before cursor ``before``, or the first page."""
+        queryset, backwards, cursor = self.page_query(after, before)
+        return self.build_page(list(queryset), backwards, cursor)
+
+    async def apage(self, after=None, before=None):
+        """``page`` through the async ORM."""
+        queryset, backwards, cursor = self.page_query(after, before)
+        return self.build_page([row async for row in queryset], backwards, cursor)
+
+    def page_query(self, after, before):
+        backwards = before is not None and after is None
+        cursor = before if backwards else after
+        queryset = self.ordered(reverse=backwards)
+        if cursor:
+            values = decode_cursor(cursor, self.key_fields)
+            # Moving forward through a descending order means moving to smaller keys.
+            queryset = queryset.filter(seek_filter(self.keys, values, forward=self.descending == backwards))
+        return queryset[:self.per_page + 1], backwards, cursor
+
+    def build_page(self, rows, backwards, cursor):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+        if not rows:
+            return KeysetPage([], None, None)
+
+        if backwards:
+            next_cursor = self.cursor_for(rows[-1])
+            previous_cursor = self.cursor_for(rows[0]) if has_more else None
+        else:
+            next_cursor = self.cursor_for(rows[-1]) if has_more else None
+            previous_cursor = self.cursor_for(rows[0]) if cursor else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+def estimated_count(queryset):
+    """
+    The planner's row estimate for ``queryset`` on PostgreSQL, else None.
+
+    EXPLAIN only reads table statistics, so this is cheap however many rows
+    the query would match.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that trusts the planner's estimate for large result sets.
+
+    An exact ``COUNT(*)`` has to visit every matching row; above
+    ``SALESORDERS_ESTIMATED_COUNT_THRESHOLD`` estimated rows the estimate is
+    used instead, so the page count is approximate but the page itself is
+    still exact. Smaller results, and other databases, are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        threshold = getattr(settings, "SALESORDERS_ESTIMATED_COUNT_THRESHOLD", ESTIMATED_COUNT_THRESHOLD)
+        estimate = estimated_count(self.object_list) if hasattr(self.object_list, "query") else None
+        if estimate is not None and estimate > threshold:
+            return estimate
+        return super().count
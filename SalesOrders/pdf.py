@@ -0,0 +1,153 @@
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Prefetch
+from django.template.loader import get_template
+from xhtml2pdf import pisa
+
+from .importer import chunked
+from .models import CHANGE_TRACKING_FIELDS, SalesOrderLines
+from .timing import section
+
+PDF_TEMPLATE = "admin/salesorder_pdf.html"
+
+
+def pdf_cache():
+    return caches[getattr(settings, "SALESORDERS_PDF_CACHE", "default")]
+
+
+@lru_cache(maxsize=None)
+def template_version():
+    """Hash of the PDF template source, so editing the template invalidates old PDFs."""
+    template = get_template(PDF_TEMPLATE)
+    return hashlib.sha256(template.template.source.encode("utf-8")).hexdigest()[:16]
+
+
+def row_values(instance):
+    # The row timestamps and change numbers are not printed; leaving them out
+    # keeps a touched but unchanged order from being rendered again.
+    return [
+        str(getattr(instance, field.attname))
+        for field in instance._meta.concrete_fields
+        if field.name not in CHANGE_TRACKING_FIELDS
+    ]
+
+
+def order_fingerprint(order, order_lines):
+    """Hash everything that ends up in the rendered PDF."""
+    digest = hashlib.sha256(template_version().encode())
+    digest.update("\x1f".join(row_values(order)).encode("utf-8"))
+    for line in order_lines:
+        digest.update(b"\x1e")
+        digest.update("\x1f".join(row_values(line)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def render_order_pdf(order, order_lines):
+    return render_pdf({"order": order, "order_lines": order_lines})
+
+
+def render_pdf(context):
+    with section("template_render"):
+        html = get_template(PDF_TEMPLATE).render(context)
+    output = BytesIO()
+    with section("pdf_render"):
+        pisa.CreatePDF(BytesIO(html.encode("UTF-8")), dest=output)
+    return output.getvalue()
+
+
+def pdf_filename(order_pk):
+    return f"SalesOrder_{order_pk}.pdf"
+
+
+def pointer_key(order_pk):
+    return "salesorders:pdf:order:" + hashlib.md5(str(order_pk).encode("utf-8")).hexdigest()
+
+
+def entry_key(fingerprint):
+    return f"salesorders:pdf:{fingerprint}"
+
+
+def get_order_pdf(order, order_lines, fingerprint=None):
+    """
+    Return ``(pdf_bytes, fingerprint, rendered_at)`` for an order.
+
+    Entries are keyed by the content fingerprint, so a changed order or
+    template can never be served a stale PDF. The per-order pointer lets
+    ``invalidate_order_pdf`` drop the old entry as soon as the order changes.
+    Pass ``fingerprint`` if it has already been computed.
+    """
+    order_lines = list(order_lines)
+    if fingerprint is None:
+        fingerprint = order_fingerprint(order, order_lines)
+    cache = pdf_cache()
+
+    entry = cache.get(entry_key(fingerprint))
+    if entry is None:
+        entry = (render_order_pdf(order, order_lines), time.time())
+        cache.set_many({entry_key(fingerprint): entry, pointer_key(order.pk): fingerprint})
+    pdf, rendered_at = entry
+    return pdf, fingerprint, rendered_at
+
+
+def plain_context(order, order_lines):
+    """Template context made of plain values, so it can be sent to another process."""
+    return {
+        "order": {field.attname: getattr(order, field.attname) for field in order._meta.concrete_fields},
+        "order_lines": [
+            {field.attname: getattr(line, field.attname) for field in line._meta.concrete_fields}
+            for line in order_lines
+        ],
+    }
+
+
+def init_render_worker():
+    # Processes started with "spawn" have to configure Django themselves.
+    import django
+
+    django.setup()
+
+
+def render_order_pdfs(orders, workers=None, chunk_size=100, use_cache=True):
+    """
+    Yield ``(filename, pdf_bytes)`` for every order in ``orders``.
+
+    Orders are loaded ``chunk_size`` at a time with their lines prefetched in
+    one extra query per chunk. Cached PDFs are reused; the rest are rendered
+    in parallel by a pool of ``workers`` processes.
+    """
+    workers = workers or getattr(settings, "SALESORDERS_PDF_WORKERS", None) or os.cpu_count() or 1
+    orders = orders.prefetch_related(
+        Prefetch("order_lines", queryset=SalesOrderLines.objects.order_by("pk"))
+    )
+    cache = pdf_cache()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_render_worker) as pool:
+        for chunk in chunked(orders.iterator(chunk_size=chunk_size), chunk_size):
+            pending = {}
+            for order in chunk:
+                order_lines = list(order.order_lines.all())
+                fingerprint = order_fingerprint(order, order_lines)
+                entry = cache.get(entry_key(fingerprint)) if use_cache else None
+                if entry is not None:
+                    yield pdf_filename(order.pk), entry[0]
+                else:
+                    pending[order.pk] = (fingerprint, plain_context(order, order_lines))
+
+            contexts = [context for _, context in pending.values()]
+            for (order_pk, (fingerprint, _)), pdf in zip(pending.items(), pool.map(render_pdf, contexts)):
+                cache.set_many({entry_key(fingerprint): (pdf, time.time()), pointer_key(order_pk): fingerprint})
+                yield pdf_filename(order_pk), pdf
+
+
+def invalidate_order_pdf(order_pk):
+    cache = pdf_cache()
+    fingerprint = cache.get(pointer_key(order_pk))
+    if fingerprint is not None:
+        cache.delete_many([pointer_key(order_pk), entry_key(fingerprint)])
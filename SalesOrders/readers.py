@@ -0,0 +1,200 @@
+import csv
+import hashlib
+import io
+import os
+import zipfile
+
+import openpyxl
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import models
+
+from .importer import LINE_COLUMNS, ORDER_COLUMNS
+from .models import SalesOrder, SalesOrderLines
+
+SPREADSHEET_EXTENSIONS = (".xlsx", ".csv", ".zip")
+
+
+class SpreadsheetError(Exception):
+    pass
+
+
+def file_extension(file):
+    return os.path.splitext(file.name or "")[1].lower()
+
+
+def upload_hash(*files):
+    """SHA-256 over the contents of the uploaded files, read in chunks."""
+    digest = hashlib.sha256()
+    for file in files:
+        if file is None:
+            continue
+        for chunk in file.chunks():
+            digest.update(chunk)
+        digest.update(b"\0")
+        file.seek(0)
+    return digest.hexdigest()
+
+
+def csv_rows(binary_file):
+    """Lazily yield the data rows of a CSV file, skipping its header row."""
+    text = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.reader(text)
+        next(reader, None)
+        yield from reader
+    finally:
+        text.detach()
+
+
+def count_lines(binary_file, block_size=1024 * 1024):
+    """Count the data lines of a CSV file without decoding it."""
+    if hasattr(binary_file, "seek"):
+        binary_file.seek(0)
+    lines = 0
+    last = b"\n"
+    while block := binary_file.read(block_size):
+        lines += block.count(b"\n")
+        last = block[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(lines - 1, 0)
+
+
+def column_parsers(model, columns):
+    """Map each column position to a parser for the text CSV gives us."""
+    date_field = forms.DateField()
+
+    def parse_date(value):
+        try:
+            return date_field.to_python(value)
+        except ValidationError:
+            return value  # left for the importer to report
+
+    parsers = []
+    for name in columns:
+        field = model._meta.get_field(name)
+        if isinstance(field, models.DateField):
+            parsers.append(parse_date)
+        else:
+            parsers.append(None)
+    return parsers
+
+
+def typed_rows(rows, model, columns):
+    """Strip CSV text cells and convert blanks and dates to Python values."""
+    parsers = column_parsers(model, columns)
+    for row in rows:
+        values = []
+        for position, value in enumerate(row):
+            value = value.strip()
+            if not value:
+                value = None
+            elif position < len(parsers) and parsers[position]:
+                value = parsers[position](value)
+            values.append(value)
+        yield tuple(values)
+
+
+class SpreadsheetSource:
+    """
+    Streaming access to the two import sheets of an uploaded file.
+
+    Accepts an .xlsx workbook (opened in read-only mode), a .csv of sales
+    orders plus a second .csv of order lines, or a .zip holding both CSVs.
+    ``order_rows()`` and ``line_rows()`` are generators, so only the current
+    row is held in memory whatever the file size.
+    """
+
+    def __init__(self, file, lines_file=None):
+        self.file = file
+        self.lines_file = lines_file
+        self.workbook = None
+        self.archive = None
+        self.kind = file_extension(file)
+
+        if self.kind == ".xlsx":
+            try:
+                self.workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+            except Exception as e:
+                raise SpreadsheetError(f"Failed to open Excel file: {e}")
+            if len(self.workbook.worksheets) < 2:
+                self.close()
+                raise SpreadsheetError(
+                    "Your Excel file must have at least two sheets: one for Sales Orders and one for Order Lines."
+                )
+        elif self.kind == ".zip":
+            try:
+                self.archive = zipfile.ZipFile(file)
+            except zipfile.BadZipFile as e:
+                raise SpreadsheetError(f"Failed to open ZIP file: {e}")
+            self.order_member, self.lines_member = self.find_csv_members()
+        elif self.kind == ".csv":
+            if lines_file is None:
+                raise SpreadsheetError("Upload the Order Lines CSV together with the Sales Orders CSV.")
+        else:
+            raise SpreadsheetError(
+                f"Unsupported file type '{self.kind}'. Use {', '.join(SPREADSHEET_EXTENSIONS)}."
+            )
+
+    def find_csv_members(self):
+        names = [name for name in self.archive.namelist() if name.lower().endswith(".csv")]
+        if len(names) < 2:
+            self.close()
+            raise SpreadsheetError("The ZIP file must contain two CSV files: Sales Orders and Order Lines.")
+        lines = [name for name in names if "line" in os.path.basename(name).lower()]
+        if len(lines) == 1:
+            orders = [name for name in names if name != lines[0]]
+            return orders[0], lines[0]
+        return names[0], names[1]
+
+    def order_rows(self):
+        if self.workbook is not None:
+            return self.workbook.worksheets[0].iter_rows(min_row=2, values_only=True)
+        return typed_rows(self.csv_member(self.file, "order_member"), SalesOrder, ORDER_COLUMNS)
+
+    def line_rows(self):
+        if self.workbook is not None:
+            return self.workbook.worksheets[1].iter_rows(min_row=2, values_only=True)
+        return typed_rows(self.csv_member(self.lines_file, "lines_member"), SalesOrderLines, LINE_COLUMNS)
+
+    def count_rows(self):
+        """
+        Estimate the number of data rows in both sheets, for progress reporting.
+
+        Returns None when it is unknown: workbooks written in write-only mode,
+        like our own exports, do not record their dimensions, and counting
+        their rows would mean parsing the whole file an extra time.
+        """
+        if self.workbook is not None:
+            sheets = self.workbook.worksheets[:2]
+            if any(sheet.max_row is None for sheet in sheets):
+                return None
+            return sum(max(sheet.max_row - 1, 0) for sheet in sheets)
+        if self.archive is not None:
+            total = 0
+            for name in (self.order_member, self.lines_member):
+                with self.archive.open(name) as member:
+                    total += count_lines(member)
+            return total
+        return count_lines(self.file) + count_lines(self.lines_file)
+
+    def csv_member(self, file, member_attr):
+        if self.archive is not None:
+            with self.archive.open(getattr(self, member_attr)) as member:
+                yield from csv_rows(member)
+        else:
+            file.seek(0)
+            yield from csv_rows(file)
+
+    def close(self):
+        if self.workbook is not None:
+            self.workbook.close()
+        if self.archive is not None:
+            self.archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,120 @@
+import datetime
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import CustomerRollup, SalesOrder, SalesRollup
+
+# Each rollup table and the order columns it is keyed on, besides the month.
+ROLLUP_DIMENSIONS = {
+    SalesRollup: ["salesperson", "currency", "status"],
+    CustomerRollup: ["customer", "currency"],
+}
+ROLLUP_MEASURES = ["order_count", "orders_total", "line_count", "revenue", "cost", "margin"]
+ROLLUP_BATCH_SIZE = 1000
+# First key of the PostgreSQL advisory locks taken by lock_rollups(); the second
+# is a month number, or 0 for the whole table.
+ROLLUP_LOCK_NAMESPACE = 0x5A11
+
+
+def month_start(value):
+    return value.replace(day=1)
+
+
+def next_month(period):
+    return (period + datetime.timedelta(days=32)).replace(day=1)
+
+
+def period_condition(periods):
+    """Date ranges covering ``periods``, so the (creation_date, ...) index is used."""
+    condition = Q()
+    for period in periods:
+        condition |= Q(creation_date__gte=period, creation_date__lt=next_month(period))
+    return condition
+
+
+def rollup_rows(orders, dimensions):
+    """Aggregate ``orders`` into one dict per rollup key, using the stored line totals."""
+    return (
+        orders.order_by()
+        .annotate(period=TruncMonth("creation_date"))
+        .values("period", *dimensions)
+        .annotate(
+            order_count=Count("pk"),
+            orders_total=Sum("total"),
+            line_count=Sum("line_count"),
+            revenue=Sum("lines_revenue"),
+            cost=Sum("lines_cost"),
+            margin=Sum("lines_margin"),
+        )
+    )
+
+
+def write_rollups(orders, using):
+    """Insert the rollups of ``orders`` into every rollup table; returns the number of rows."""
+    count = 0
+    for model, dimensions in ROLLUP_DIMENSIONS.items():
+        rollups = (model(**row) for row in rollup_rows(orders, dimensions).iterator())
+        count += len(model.objects.using(using).bulk_create(rollups, batch_size=ROLLUP_BATCH_SIZE))
+    return count
+
+
+def lock_rollups(periods=None, using=DEFAULT_DB_ALIAS):
+    """
+    Serialise rebuilds of the same months, until the transaction ends.
+
+    Rollups are rebuilt by deleting a month and inserting it again. Under
+    READ COMMITTED, a second rebuild of the same month running at the same
+    time (after two admin saves, or a save during an import) cannot see the
+    first one's new rows, and its inserts would violate the rollups' unique
+    keys. With the lock it waits for the first to
+    commit instead. ``periods=None`` locks the whole table, for
+    ``rebuild_rollups()``.
+
+    PostgreSQL only: SQLite already lets one writer in at a time.
+    """
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        if periods is None:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s, 0)", [ROLLUP_LOCK_NAMESPACE])
+            return
+        cursor.execute("SELECT pg_advisory_xact_lock_shared(%s, 0)", [ROLLUP_LOCK_NAMESPACE])
+        # In order, so two refreshes of overlapping months cannot deadlock.
+        for period in sorted(periods):
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock(%s, %s)", [ROLLUP_LOCK_NAMESPACE, period.year * 12 + period.month]
+            )
+
+
+def refresh_periods(periods, using=DEFAULT_DB_ALIAS):
+    """
+    Rebuild the rollups of the months containing ``periods``.
+
+    Only the orders of those months are aggregated, so the cost follows the
+    size of the change rather than the size of the table.
+    """
+    periods = sorted({month_start(period) for period in periods if period is not None})
+    if not periods:
+        return 0
+    with transaction.atomic(using=using):
+        lock_rollups(periods, using=using)
+        for model in ROLLUP_DIMENSIONS:
+            model.objects.using(using).filter(period__in=periods).delete()
+        return write_rollups(SalesOrder.objects.using(using).filter(period_condition(periods)), using)
+
+
+def rebuild_rollups(using=DEFAULT_DB_ALIAS):
+    with transaction.atomic(using=using):
+        lock_rollups(using=using)
+        for model in ROLLUP_DIMENSIONS:
+            model.objects.using(using).all().delete()
+        return write_rollups(SalesOrder.objects.using(using).all(), using)
+
+
+def refresh_order_periods(order_pks, using=DEFAULT_DB_ALIAS):
+    """Rebuild the rollups of the months the given orders belong to."""
+    orders = SalesOrder.objects.using(using).filter(pk__in=order_pks)
+    return refresh_periods(orders.dates("creation_date", "month"), using=using)
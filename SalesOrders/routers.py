@@ -0,0 +1,169 @@
+import asyncio
+import contextvars
+import logging
+import time
+from contextlib import ContextDecorator
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+# After a failed connection attempt, reads stay on the primary this long (seconds).
+REPLICA_RETRY_SECONDS = 30
+
+reading_from_replica = contextvars.ContextVar("salesorders_read_replica", default=False)
+replica_down_until = {}
+
+
+def replica_alias():
+    """The configured read replica alias, or None if there is none."""
+    alias = getattr(settings, "SALESORDERS_READ_REPLICA", None)
+    return alias if alias and alias in settings.DATABASES else None
+
+
+def in_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def replica_available(alias):
+    if time.monotonic() < replica_down_until.get(alias, 0):
+        return False
+    if in_event_loop():
+        # Connecting would block the loop; async views check the replica
+        # from a thread when they start (see read_replica).
+        return True
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError as e:
+        logger.warning("Read replica %r unavailable, reading from %r: %s", alias, DEFAULT_DB_ALIAS, e)
+        replica_down_until[alias] = time.monotonic() + REPLICA_RETRY_SECONDS
+        return False
+    replica_down_until.pop(alias, None)
+    return True
+
+
+def read_alias():
+    """
+    The alias reads should use right now.
+
+    The replica inside ``read_replica()``, unless none is configured, it
+    cannot be reached, or the primary is in a transaction (whose own writes
+    the replica cannot see).
+    """
+    if not reading_from_replica.get():
+        return DEFAULT_DB_ALIAS
+    alias = replica_alias()
+    if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return DEFAULT_DB_ALIAS
+    return alias if replica_available(alias) else DEFAULT_DB_ALIAS
+
+
+class read_replica(ContextDecorator):
+    """
+    Send the reads in a block (or decorated view) to the read replica.
+
+    Only for read-only paths that can live with replication lag: exports,
+    PDFs, the API and the dashboard. Not for pages kept in the page cache,
+    which would keep serving what a lagging replica returned. Writes always
+    go to the primary. Decorates async views too.
+    """
+
+    def __call__(self, func):
+        if not iscoroutinefunction(func):
+            return super().__call__(func)
+
+        @wraps(func)
+        async def inner(*args, **kwargs):
+            with self._recreate_cm():
+                await sync_to_async(read_alias)()
+                return await func(*args, **kwargs)
+
+        return inner
+
+    def _recreate_cm(self):
+        # A fresh instance per decorated call, so concurrent requests don't share the token.
+        return type(self)()
+
+    def __enter__(self):
+        self.token = reading_from_replica.set(True)
+        return self
+
+    def __exit__(self, *exc):
+        reading_from_replica.reset(self.token)
+        return False
+
+
+def replica_chunks(chunks):
+    """
+    Iterate ``chunks`` with every step inside ``read_replica()``.
+
+    Streamed responses run their queries after the view has returned, so
+    they need the replica context of their own. It is entered per chunk
+    because ASGI servers may fetch each chunk in a different thread.
+    """
+    chunks = iter(chunks)
+    while True:
+        with read_replica():
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+        yield chunk
+
+
+async def areplica_chunks(chunks):
+    """Async version of ``replica_chunks``, for responses built by async views."""
+    chunks = aiter(chunks)
+    while True:
+        with read_replica():
+            try:
+                chunk = await anext(chunks)
+            except StopAsyncIteration:
+                return
+        yield chunk
+
+
+def stream_from_replica(response):
+    if response.streaming:
+        wrap = areplica_chunks if response.is_async else replica_chunks
+        response.streaming_content = wrap(response.streaming_content)
+    return response
+
+
+class ReadReplicaRouter:
+    """
+    Routes reads made under ``read_replica()`` to ``SALESORDERS_READ_REPLICA``
+    and everything else to the primary.
+
+    Only this app's models are read from the replica; sessions, users and
+    the rest stay on the primary so a fresh login is never missed. Returning
+    the primary explicitly (instead of no opinion) keeps objects read from
+    the replica from being saved back to it.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != "SalesOrders":
+            return DEFAULT_DB_ALIAS
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary.
+        if db == replica_alias():
+            return False
+        return None
@@ -0,0 +1,165 @@
+import re
+from decimal import Decimal, InvalidOperation
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.text import smart_split, unescape_string_literal
+
+# Columns covered by the full-text index
+TEXT_SEARCH_COLUMNS = ["order_reference", "customer", "salesperson", "status", "currency"]
+
+SEARCH_INDEX_NAME = "salesorder_search_idx"
+SQLITE_FTS_TABLE = "SalesOrders_salesorder_fts"
+SQLITE_FTS_TRIGGERS = {
+    "salesorder_fts_insert": """
+        CREATE TRIGGER salesorder_fts_insert AFTER INSERT ON "{table}" BEGIN
+            INSERT INTO "{fts}" (rowid, {columns})
+            VALUES (new.rowid, {new_values});
+        END""",
+    "salesorder_fts_delete": """
+        CREATE TRIGGER salesorder_fts_delete AFTER DELETE ON "{table}" BEGIN
+            INSERT INTO "{fts}" ("{fts}", rowid, {columns})
+            VALUES ('delete', old.rowid, {old_values});
+        END""",
+    "salesorder_fts_update": """
+        CREATE TRIGGER salesorder_fts_update AFTER UPDATE ON "{table}" BEGIN
+            INSERT INTO "{fts}" ("{fts}", rowid, {columns})
+            VALUES ('delete', old.rowid, {old_values});
+            INSERT INTO "{fts}" (rowid, {columns})
+            VALUES (new.rowid, {new_values});
+        END""",
+}
+
+date_field = forms.DateField()
+
+
+def search_vector():
+    from django.contrib.postgres.search import SearchVector
+
+    return SearchVector(*TEXT_SEARCH_COLUMNS, config="simple")
+
+
+def search_index():
+    """Functional GIN index matching ``search_vector()``, used on PostgreSQL."""
+    from django.contrib.postgres.indexes import GinIndex
+
+    return GinIndex(search_vector(), name=SEARCH_INDEX_NAME)
+
+
+def install_sqlite_fts(connection, model):
+    """
+    Create the FTS5 table and its triggers if they are missing.
+
+    Runs after every migrate: SQLite migrations rebuild the orders table when
+    columns are added, which drops triggers attached to it.
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name IN (%s)"
+            % ", ".join(["%s"] * (len(SQLITE_FTS_TRIGGERS) + 1)),
+            [SQLITE_FTS_TABLE, *SQLITE_FTS_TRIGGERS],
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        if len(existing) == len(SQLITE_FTS_TRIGGERS) + 1:
+            return
+
+        if SQLITE_FTS_TABLE not in existing:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE "{SQLITE_FTS_TABLE}" USING fts5('
+                f'{", ".join(TEXT_SEARCH_COLUMNS)}, content="{table}", content_rowid="rowid")'
+            )
+        for name, sql in SQLITE_FTS_TRIGGERS.items():
+            if name not in existing:
+                cursor.execute(sql.format(
+                    table=table,
+                    fts=SQLITE_FTS_TABLE,
+                    columns=", ".join(TEXT_SEARCH_COLUMNS),
+                    new_values=", ".join(f"new.{column}" for column in TEXT_SEARCH_COLUMNS),
+                    old_values=", ".join(f"old.{column}" for column in TEXT_SEARCH_COLUMNS),
+                ))
+        cursor.execute(f'INSERT INTO "{SQLITE_FTS_TABLE}" ("{SQLITE_FTS_TABLE}") VALUES (\'rebuild\')')
+
+
+def parse_date(word):
+    try:
+        return date_field.to_python(word)
+    except ValidationError:
+        return None
+
+
+def parse_amount(word):
+    if not re.fullmatch(r"-?[\d,]+(\.\d+)?", word):
+        return None
+    try:
+        return Decimal(word.replace(",", ""))
+    except InvalidOperation:
+        return None
+
+
+def search_words(search_term):
+    for word in smart_split(search_term):
+        if word.startswith(('"', "'")) and word[0] == word[-1]:
+            word = unescape_string_literal(word)
+        word = word.strip()
+        if word:
+            yield word
+
+
+def text_condition(vendor, word):
+    tokens = re.findall(r"\w+", word)
+    if not tokens:
+        return Q(pk__in=[])
+
+    if vendor == "postgresql":
+        from django.contrib.postgres.search import SearchQuery
+
+        query = SearchQuery(" & ".join(f"{token}:*" for token in tokens), search_type="raw", config="simple")
+        return Q(search_document=query)
+
+    if vendor == "sqlite":
+        match = " ".join(f'"{token}"*' for token in tokens)
+        return Q(pk__in=RawSQL(
+            f'SELECT order_reference FROM "{SQLITE_FTS_TABLE}" WHERE "{SQLITE_FTS_TABLE}" MATCH %s', [match]
+        ))
+
+    condition = Q()
+    for column in TEXT_SEARCH_COLUMNS:
+        condition |= Q(**{f"{column}__icontains": word})
+    return condition
+
+
+def word_condition(vendor, word):
+    """
+    Match one search word against the columns its type points to.
+
+    Dates and amounts are compared with equality on ``creation_date`` and
+    ``total``; text goes through the full-text index. Every branch of the
+    OR can use an index, so the database never has to scan the table.
+    """
+    condition = text_condition(vendor, word)
+    date = parse_date(word)
+    if date is not None:
+        condition |= Q(creation_date=date)
+    amount = parse_amount(word)
+    if amount is not None:
+        condition |= Q(total=amount)
+    return condition
+
+
+def search_orders(queryset, search_term):
+    """Return orders matching every word of ``search_term``."""
+    words = list(search_words(search_term))
+    if not words:
+        return queryset
+
+    vendor = connections[queryset.db].vendor
+    if vendor == "postgresql":
+        # Same expression as the GIN index, so PostgreSQL can use it.
+        queryset = queryset.annotate(search_document=search_vector())
+    for word in words:
+        queryset = queryset.filter(word_condition(vendor, word))
+    return queryset
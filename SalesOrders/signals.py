@@ -0,0 +1,110 @@
+import threading
+
+from django.apps import apps
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete
+from django.dispatch import receiver
+
+from .autocomplete import invalidate_suggestions
+from .caching import bump_version
+from .models import SalesOrder, SalesOrderLines, Tombstone, order_lines_changed
+from .pdf import invalidate_order_pdf
+from .rollups import month_start, refresh_order_periods, refresh_periods
+from .search import install_sqlite_fts
+from .timing import install_query_timing
+
+
+class OnCommitBatch:
+    """
+    Collect keys during a transaction and hand them to ``flush`` once, after commit.
+
+    Saving 50 lines of one order in an admin formset then refreshes that
+    order once instead of 50 times. Outside a transaction ``on_commit``
+    runs immediately, so single saves still take effect straight away.
+    """
+
+    def __init__(self, flush):
+        self.flush = flush
+        self.local = threading.local()
+
+    def add(self, key, using):
+        pending = self.local.__dict__.setdefault("pending", {})
+        pending.setdefault(using, set()).add(key)
+        # Registered on every add so a batch left behind by a rolled-back
+        # transaction is still flushed by the next commit.
+        transaction.on_commit(lambda: self.run(using), using=using)
+
+    def run(self, using):
+        keys = self.local.__dict__.get("pending", {}).pop(using, None)
+        if keys:
+            self.flush(keys, using)
+
+
+def refresh_order_totals(order_pks, using):
+    SalesOrder.objects.using(using).filter(pk__in=order_pks).refresh_line_totals()
+    # The rollups are built from these totals, so they follow straight after.
+    refresh_order_periods(order_pks, using=using)
+
+
+order_totals = OnCommitBatch(refresh_order_totals)
+rollup_periods = OnCommitBatch(lambda periods, using: refresh_periods(periods, using=using))
+# One bump per transaction, after commit, so no page is cached from uncommitted data
+page_versions = OnCommitBatch(lambda keys, using: bump_version())
+
+
+@receiver([post_save, post_delete], sender=SalesOrder)
+def sales_order_changed(sender, instance, using, **kwargs):
+    invalidate_order_pdf(instance.pk)
+    invalidate_suggestions()
+    page_versions.add("orders", using)
+    for date in (instance.creation_date, getattr(instance, "_loaded_creation_date", None)):
+        if date is not None:
+            rollup_periods.add(month_start(date), using)
+
+
+@receiver([post_save, post_delete], sender=SalesOrderLines)
+def sales_order_line_changed(sender, instance, using, **kwargs):
+    invalidate_order_pdf(instance.order_reference_id)
+    order_totals.add(instance.order_reference_id, using)
+    page_versions.add("orders", using)
+
+
+@receiver(order_lines_changed, sender=SalesOrderLines)
+def sales_order_lines_bulk_changed(sender, order_pks, using, **kwargs):
+    for order_pk in order_pks:
+        invalidate_order_pdf(order_pk)
+        order_totals.add(order_pk, using)
+    page_versions.add("orders", using)
+
+
+@receiver(pre_delete, sender=SalesOrder)
+def record_order_deletion(sender, instance, using, **kwargs):
+    # Written in the deleting transaction, so a rolled back delete leaves no
+    # tombstone, and before any row is deleted, so the change number is taken
+    # before any row lock (see ChangeCounter).
+    Tombstone.objects.using(using).create(
+        kind=Tombstone.ORDER, object_pk=instance.pk, order_reference=instance.pk
+    )
+
+
+@receiver(pre_delete, sender=SalesOrderLines)
+def record_line_deletion(sender, instance, using, origin=None, **kwargs):
+    # Lines removed along with their order are covered by the order's tombstone.
+    if isinstance(origin, SalesOrder) or getattr(origin, "model", None) is SalesOrder:
+        return
+    Tombstone.objects.using(using).create(
+        kind=Tombstone.LINE, object_pk=instance.pk, order_reference=instance.order_reference_id
+    )
+
+
+connection_created.connect(install_query_timing)
+
+
+@receiver(post_migrate)
+def install_search_index(sender, using, **kwargs):
+    if sender is not apps.get_app_config("SalesOrders"):
+        return
+    connection = connections[using]
+    if connection.vendor == "sqlite" and SalesOrder._meta.db_table in connection.introspection.table_names():
+        install_sqlite_fts(connection, SalesOrder)
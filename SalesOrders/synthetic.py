@@ -0,0 +1,138 @@
+import datetime
+import random
+from decimal import Decimal
+
+from openpyxl import Workbook
+
+from .exporter import LINE_HEADERS, LINES_CSV_NAME, ORDER_HEADERS, ORDERS_CSV_NAME, csv_chunks, zip_chunks
+from .importer import ORDER_COLUMNS
+
+CUSTOMER_WORDS = [
+    "Acacia", "Baobab", "Coast", "Delta", "Equator", "Highland", "Kilima", "Lakeside",
+    "Mara", "Nile", "Rift", "Savanna", "Summit", "Tana", "Umoja", "Valley",
+]
+CUSTOMER_KINDS = [
+    "Holdings", "Traders", "Logistics", "Hospital", "County Government", "Bank", "Insurance",
+    "Academy", "Supermarkets", "Engineering",
+]
+PRODUCTS = [
+    "Laptop", "Desktop", "Monitor", "Printer", "Toner Cartridge", "UPS", "Network Switch",
+    "Router", "Access Point", "Server", "Firewall", "IP Phone", "Projector", "Scanner",
+    "External Drive", "Keyboard", "Mouse", "Docking Station", "Software Licence", "Support Contract",
+]
+SALESPEOPLE = [
+    "Achieng Otieno", "Brian Mwangi", "Cynthia Wanjiru", "David Kiprop", "Esther Njeri",
+    "Felix Ouma", "Grace Mutua", "Hassan Ali", "Irene Chebet", "James Kamau",
+]
+OFFICES = ["Nairobi", "Mombasa", "Kisumu", "Nakuru", "Eldoret"]
+# (value, weight) pairs
+STATUSES = [("Confirmed", 45), ("Invoiced", 25), ("Draft", 15), ("Delivered", 10), ("Cancelled", 5)]
+CURRENCIES = [("KES", 80), ("USD", 15), ("EUR", 5)]
+
+CENT = Decimal("0.01")
+
+
+def weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+class SyntheticSalesData:
+    """
+    Deterministic, realistic-looking sales orders and lines.
+
+    Every order is generated from its own seeded random stream, so the
+    orders and the lines can be produced in two separate passes (as the
+    two sheets of a workbook need) without keeping anything in memory.
+    Order totals match the sum of their lines.
+    """
+
+    def __init__(self, orders, lines_per_order=5, seed=1, prefix="SYN", days=730, end_date=None):
+        self.orders = orders
+        self.lines_per_order = lines_per_order
+        self.seed = seed
+        self.prefix = prefix
+        self.days = days
+        self.end_date = end_date or datetime.date.today()
+        rng = random.Random(seed)
+        customer_count = max(10, orders // 50)
+        self.customers = [
+            f"{rng.choice(CUSTOMER_WORDS)} {rng.choice(CUSTOMER_KINDS)} {number}"
+            for number in range(1, customer_count + 1)
+        ]
+        self.prices = {product: Decimal(rng.randint(500, 250000)) for product in PRODUCTS}
+
+    def reference(self, index):
+        return f"{self.prefix}{index:08d}"
+
+    def order(self, index):
+        """Return ``(order_row, line_rows)`` for order number ``index``."""
+        rng = random.Random(self.seed * 1_000_003 + index)
+        reference = self.reference(index)
+        customer = rng.choice(self.customers)
+        created = self.end_date - datetime.timedelta(days=rng.randrange(self.days))
+
+        lines = []
+        total = Decimal(0)
+        for _ in range(rng.randint(1, max(1, 2 * self.lines_per_order - 1))):
+            product = rng.choice(PRODUCTS)
+            quantity = rng.randint(1, 50)
+            unit_price = (self.prices[product] * Decimal(rng.uniform(0.9, 1.1))).quantize(CENT)
+            cost = (unit_price * Decimal(rng.uniform(0.6, 0.95))).quantize(CENT)
+            lines.append((reference, product, quantity, unit_price, cost, None, None))
+            total += quantity * unit_price
+
+        contact = rng.choice(["Mary", "Peter", "Ann", "John", "Lucy", "Tom"])
+        lpo_date = created - datetime.timedelta(days=rng.randint(0, 14))
+        values = {
+            "creation_date": created,
+            "customer": customer,
+            "currency": weighted(rng, CURRENCIES),
+            "order_reference": reference,
+            "salesperson": rng.choice(SALESPEOPLE),
+            "status": weighted(rng, STATUSES),
+            "total": total,
+            "primary_contact": contact,
+            "finance_contact": "Accounts",
+            "delivery_address": f"P.O. Box {rng.randint(100, 99999)}, {rng.choice(OFFICES)}",
+            "invoice_address": f"P.O. Box {rng.randint(100, 99999)}, {rng.choice(OFFICES)}",
+            "email_address": f"{contact.lower()}@example.com",
+            "delivery_date": created + datetime.timedelta(days=rng.randint(1, 30)),
+            "delivery_office_location": rng.choice(OFFICES),
+            "tell_no": f"07{rng.randint(10000000, 99999999)}",
+            "designation": "Procurement Officer",
+            "department": "Procurement",
+            "lpo_confirmation_date": lpo_date,
+            "lpo_date": lpo_date,
+            "lpo_number": f"LPO-{rng.randint(1000, 999999)}",
+            "comments": "Deliver during working hours." if rng.random() < 0.3 else None,
+        }
+        return tuple(values[name] for name in ORDER_COLUMNS), lines
+
+    def order_rows(self):
+        for index in range(1, self.orders + 1):
+            yield self.order(index)[0]
+
+    def line_rows(self):
+        for index in range(1, self.orders + 1):
+            yield from self.order(index)[1]
+
+    def write_xlsx(self, target):
+        """Write an import workbook with openpyxl's write-only mode."""
+        wb = Workbook(write_only=True)
+        orders_sheet = wb.create_sheet(title="Sales Orders")
+        orders_sheet.append(ORDER_HEADERS[:len(ORDER_COLUMNS)])
+        for row in self.order_rows():
+            orders_sheet.append(row)
+        lines_sheet = wb.create_sheet(title="Order Lines")
+        lines_sheet.append(LINE_HEADERS)
+        for row in self.line_rows():
+            lines_sheet.append(row)
+        wb.save(target)
+
+    def zip_chunks(self):
+        """Stream an import ZIP holding the orders and lines CSV files."""
+        return zip_chunks([
+            (ORDERS_CSV_NAME, csv_chunks(ORDER_HEADERS[:len(ORDER_COLUMNS)], self.order_rows())),
+            (LINES_CSV_NAME, csv_chunks(LINE_HEADERS, self.line_rows())),
+        ])
@@ -1,3 +1,576 @@
-from django.test import TestCase
+import datetime
+import io
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import openpyxl
+from django.contrib.auth.models import User
+from django.core.files import File
+from django.contrib.sessions.models import Session
+from django.db import DEFAULT_DB_ALIAS, DatabaseError
+from django.db.models import F
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from .admin import SalespersonFilter, StatusFilter
+from .caching import VERSION_KEY, bump_version, data_version, page_cache, page_stats
+from .changes import CHANGE_FEEDS
+from .exporter import xlsx_file
+from .importer import OrderImporter
+from .models import CustomerRollup, SalesOrder, SalesOrderLines, SalesOrderLinesQuerySet, SalesRollup
+from .pagination import InvalidCursor, KeysetPaginator, encode_cursor
+from .pdf import get_order_pdf, order_fingerprint, pdf_cache
+from .readers import SpreadsheetSource
+from .routers import ReadReplicaRouter, read_alias, read_replica, replica_available, replica_down_until
+from .search import search_orders
+
+
+def order_row(order_reference):
+    return (
+        datetime.date(2025, 1, 6), "Acme Ltd", "KES", order_reference, "Jane", "Confirmed", 100,
+    )
+
+
+def line_row(order_reference, product, quantity=1, unit_price=10, cost=6):
+    return (order_reference, product, quantity, unit_price, cost, None, None)
+
+
+class XlsxRoundTripTests(TestCase):
+    """A workbook written by the export imports back unchanged."""
+
+    def test_export_imports_back(self):
+        OrderImporter().run(
+            [order_row("SO1")[:6] + (Decimal("1234.56"),), order_row("SO2")],
+            [line_row("SO1", "a", 3, Decimal("10.25"), Decimal("6.10")), line_row("SO2", "b")],
+        )
+        workbook = File(
+            xlsx_file(SalesOrder.objects.order_by("pk"), SalesOrderLines.objects.order_by("pk")), name="export.xlsx"
+        )
+        SalesOrder.objects.all().delete()
+
+        with workbook, SpreadsheetSource(workbook) as source:
+            report = OrderImporter().run(source.order_rows(), source.line_rows())
+
+        self.assertEqual(report.errors, [])
+        self.assertEqual((report.orders_created, report.lines_imported), (2, 2))
+        self.assertEqual(SalesOrder.objects.get(pk="SO1").total, Decimal("1234.56"))
+        line = SalesOrderLines.objects.get(product="a")
+        self.assertEqual((line.unit_price, line.cost, line.margin), (Decimal("10.25"), Decimal("6.10"), Decimal("4.15")))
+
+
+class SpreadsheetSourceTests(TestCase):
+    def workbook(self, order_count, line_count):
+        workbook = openpyxl.Workbook()
+        workbook.active.append(["header"])
+        for _ in range(order_count):
+            workbook.active.append(["order"])
+        lines = workbook.create_sheet()
+        lines.append(["header"])
+        for _ in range(line_count):
+            lines.append(["line"])
+        content = io.BytesIO()
+        workbook.save(content)
+        return File(content, name="upload.xlsx")
+
+    def test_count_rows_xlsx(self):
+        with SpreadsheetSource(self.workbook(3, 5)) as source:
+            self.assertEqual(source.count_rows(), 8)
+
+    def test_count_rows_unknown_for_write_only_workbooks(self):
+        OrderImporter().run([order_row("SO1")], [])
+        exported = File(xlsx_file(SalesOrder.objects.all(), SalesOrderLines.objects.none()), name="export.xlsx")
+        with exported, SpreadsheetSource(exported) as source:
+            self.assertIsNone(source.count_rows())
+
+    def test_count_rows_csv(self):
+        orders = File(io.BytesIO(b"header\r\na\r\nb\r\n"), name="orders.csv")
+        lines = File(io.BytesIO(b"header\nx"), name="lines.csv")
+        with SpreadsheetSource(orders, lines) as source:
+            self.assertEqual(source.count_rows(), 3)
+
+
+class ReimportStaleLinesTests(TestCase):
+    """A re-import removes lines the file no longer has, and only those."""
+
+    def setUp(self):
+        OrderImporter().run(
+            [order_row("SO1"), order_row("SO2")],
+            [line_row("SO1", "a"), line_row("SO1", "b"), line_row("SO1", "c"), line_row("SO2", "d")],
+        )
+
+    def products(self, order_reference):
+        lines = SalesOrderLines.objects.filter(order_reference=order_reference)
+        return sorted(lines.values_list("product", flat=True))
+
+    def test_unchanged_file_writes_nothing(self):
+        report = OrderImporter().run(
+            [order_row("SO1"), order_row("SO2")],
+            [line_row("SO1", "a"), line_row("SO1", "b"), line_row("SO1", "c"), line_row("SO2", "d")],
+        )
+
+        self.assertFalse(report.changed)
+        self.assertEqual(report.lines_unchanged, 4)
+        self.assertEqual(self.products("SO1"), ["a", "b", "c"])
+
+    def test_removed_line_is_deleted(self):
+        report = OrderImporter().run([], [line_row("SO1", "a"), line_row("SO1", "c")])
+
+        self.assertEqual(report.lines_deleted, 1)
+        self.assertEqual(self.products("SO1"), ["a", "c"])
+        order = SalesOrder.objects.get(pk="SO1")
+        self.assertEqual((order.line_count, order.lines_revenue), (2, Decimal("20.00")))
+
+    def test_orders_missing_from_file_keep_their_lines(self):
+        OrderImporter().run([], [line_row("SO1", "a")])
+
+        self.assertEqual(self.products("SO2"), ["d"])
+
+    def test_rejected_row_keeps_stored_lines(self):
+        report = OrderImporter().run(
+            [], [line_row("SO1", "a"), line_row("SO1", "b", quantity="two"), line_row("SO2", "e")]
+        )
+
+        self.assertEqual(report.error_count, 1)
+        self.assertEqual(self.products("SO1"), ["a", "b", "c"])
+        # Orders without rejected rows are still brought in line with the file.
+        self.assertEqual(self.products("SO2"), ["e"])
+
+    def test_failed_chunk_keeps_stored_lines(self):
+        with mock.patch.object(SalesOrderLinesQuerySet, "bulk_create", side_effect=DatabaseError("disk full")):
+            report = OrderImporter().run([], [line_row("SO1", "a"), line_row("SO1", "b", quantity=5)])
+
+        self.assertEqual(report.error_count, 1)
+        self.assertEqual(report.lines_deleted, 0)
+        self.assertEqual(self.products("SO1"), ["a", "b", "c"])
+        self.assertEqual(SalesOrderLines.objects.get(order_reference="SO1", product="b").quantity, 1)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        OrderImporter().run([order_row(f"SO{number}") for number in range(1, 6)], [])
+        self.paginator = KeysetPaginator(SalesOrder.objects.all(), ["creation_date", "order_reference"], per_page=2)
+
+    def references(self, page):
+        return [order.order_reference for order in page]
+
+    def test_pages_forward_and_back(self):
+        first = self.paginator.page()
+        second = self.paginator.page(after=first.next_cursor)
+        last = self.paginator.page(after=second.next_cursor)
+
+        self.assertEqual(self.references(first), ["SO1", "SO2"])
+        self.assertEqual(self.references(second), ["SO3", "SO4"])
+        self.assertEqual(self.references(last), ["SO5"])
+        self.assertFalse(last.has_next)
+        self.assertEqual(self.references(self.paginator.page(before=second.previous_cursor)), ["SO1", "SO2"])
+
+    def test_cursor_values_are_validated(self):
+        with self.assertRaises(InvalidCursor):
+            self.paginator.page(after=encode_cursor(["not-a-date", "SO1"]))
+        with self.assertRaises(InvalidCursor):
+            self.paginator.page(after="not base64!")
+
+    def test_bad_cursor_is_a_bad_request(self):
+        response = self.client.get(reverse("orders"), {"after": encode_cursor(["not-a-date", "SO1"])})
+        self.assertEqual(response.status_code, 400)
+
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "password"))
+        response = self.client.get(reverse("api_changes"), {"after": encode_cursor(["yesterday", "SO1"])})
+        self.assertEqual(response.status_code, 400)
+
+
+class MarginUpdateTests(TestCase):
+    def setUp(self):
+        OrderImporter().run([order_row("SO1")], [line_row("SO1", "a", 2, 10, 6)])
+
+    def margins(self):
+        line = SalesOrderLines.objects.get()
+        return line.margin, line.margin_percentage
+
+    def test_update_with_values(self):
+        SalesOrderLines.objects.filter(product="a").update(unit_price=Decimal("100"), cost=Decimal("60"))
+        self.assertEqual(self.margins(), (Decimal("40.00"), Decimal("40.00")))
+
+        SalesOrderLines.objects.update(unit_price=50, cost=45)
+        self.assertEqual(self.margins(), (Decimal("5.00"), Decimal("10.00")))
+
+        SalesOrderLines.objects.update(unit_price=0)
+        self.assertEqual(self.margins(), (Decimal("-45.00"), None))
+
+    def test_update_with_expressions(self):
+        SalesOrderLines.objects.update(unit_price=F("unit_price") * 2)
+        self.assertEqual(self.margins(), (Decimal("14.00"), Decimal("70.00")))
+
+        SalesOrderLines.objects.update(cost=F("unit_price"))
+        self.assertEqual(self.margins(), (Decimal("0.00"), Decimal("0.00")))
+
+    def test_update_refreshes_order_totals(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            SalesOrderLines.objects.update(unit_price=20)
+        order = SalesOrder.objects.get()
+        self.assertEqual((order.lines_revenue, order.lines_margin), (Decimal("40.00"), Decimal("28.00")))
+
+
+class RollupTests(TestCase):
+    """The sales rollup grows with salespeople and statuses, not customers."""
+
+    def setUp(self):
+        orders = [order_row(f"SO{n}")[:1] + (f"Customer {n % 3}",) + order_row(f"SO{n}")[2:] for n in range(6)]
+        OrderImporter().run(orders, [line_row(f"SO{n}", "a", unit_price=n + 1) for n in range(6)])
+
+    def test_one_row_per_salesperson_currency_and_status(self):
+        rollup = SalesRollup.objects.get()
+        self.assertEqual((rollup.salesperson, rollup.currency, rollup.status), ("Jane", "KES", "Confirmed"))
+        self.assertEqual((rollup.order_count, rollup.revenue), (6, Decimal("21")))
+
+    def test_customer_rollup(self):
+        revenue = dict(CustomerRollup.objects.values_list("customer", "revenue"))
+        self.assertEqual(
+            revenue, {"Customer 0": Decimal("5"), "Customer 1": Decimal("7"), "Customer 2": Decimal("9")}
+        )
+
+    def test_dashboard(self):
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["totals"]["revenue"], Decimal("21"))
+        self.assertEqual(response.context["by_customer"][0]["customer"], "Customer 2")
+
+
+class RollupValueFilterTests(TestCase):
+    """The admin's status and salesperson filters list the rollup values."""
+
+    def setUp(self):
+        orders = [order_row("SO1"), order_row("SO2")[:4] + ("Sam", "Draft") + order_row("SO2")[6:]]
+        OrderImporter().run(orders, [line_row("SO1", "a"), line_row("SO2", "b")])
+        self.user = User.objects.create_superuser("admin")
+        self.client.force_login(self.user)
+
+    def test_choices(self):
+        for filter_class, expected in [(StatusFilter, ["Confirmed", "Draft"]), (SalespersonFilter, ["Jane", "Sam"])]:
+            with self.assertNumQueries(1):
+                list_filter = filter_class(RequestFactory().get("/"), {}, SalesOrder, None)
+            self.assertEqual(list_filter.lookup_choices, [(value, value) for value in expected])
+
+    def test_changelist_filters(self):
+        response = self.client.get(reverse("admin:SalesOrders_salesorder_changelist"), {"salesperson": "Sam"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([order.order_reference for order in response.context["cl"].result_list], ["SO2"])
+
+
+class PageCacheTests(TestCase):
+    """Cached pages are served until the order data changes."""
+
+    def setUp(self):
+        page_cache().clear()
+        page_stats.clear()
+        OrderImporter().run([order_row("SO1")], [line_row("SO1", "a")])
+
+    def get_orders(self):
+        return self.client.get(reverse("orders"))
+
+    def test_hit_until_orders_change(self):
+        self.assertEqual(self.get_orders()["X-Cache"], "MISS")
+        self.assertEqual(self.get_orders()["X-Cache"], "HIT")
+        with self.captureOnCommitCallbacks(execute=True):
+            SalesOrder.objects.filter(order_reference="SO1").get().save()
+        self.assertEqual(self.get_orders()["X-Cache"], "MISS")
+
+    def test_bump_version(self):
+        version = data_version()
+        self.assertNotEqual(bump_version(), version)
+        self.assertEqual(page_cache().get(VERSION_KEY), data_version())
+        # A culled version is replaced by a new one, never by an old number.
+        page_cache().delete(VERSION_KEY)
+        self.assertGreater(bump_version(), version)
+
+    def test_stats(self):
+        self.get_orders()
+        self.get_orders()
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        stats = self.client.get(reverse("api_cache_stats")).json()
+        self.assertEqual(stats["pages"]["orders"], {"hits": 1, "misses": 1})
+        self.assertEqual(stats["version"], data_version())
+
+
+class ExportSinceTests(TestCase):
+    """An export since a date holds the orders created or edited since then."""
+
+    def setUp(self):
+        OrderImporter().run([order_row("SO1"), order_row("SO2"), order_row("SO3")], [])
+        old = datetime.datetime(2025, 1, 6, tzinfo=datetime.timezone.utc)
+        orders = SalesOrder.objects.all()
+        orders.filter(order_reference="SO1").update(creation_date=datetime.date(2025, 3, 1), updated_at=old)
+        orders.filter(order_reference="SO2").update(updated_at=old)
+        # Created before the date, but edited since.
+        orders.filter(order_reference="SO3").update(creation_date=datetime.date(2024, 12, 1))
+        self.client.force_login(User.objects.create_superuser("admin"))
+
+    def test_since(self):
+        response = self.client.get(
+            reverse("admin:SalesOrders_salesorder_export_orders"), {"format": "csv", "since": "2025-02-01"}
+        )
+        self.assertEqual(response.status_code, 200)
+        rows = b"".join(response.streaming_content).decode().splitlines()[1:]
+        self.assertEqual(sorted(row.split(",")[3] for row in rows), ["SO1", "SO3"])
+
+
+class ChangeFeedTests(TestCase):
+    """Every write lands after the feed's cursor, whatever its timestamps."""
+
+    def setUp(self):
+        OrderImporter().run([order_row("SO1"), order_row("SO2"), order_row("SO3")], [line_row("SO1", "a")])
+        self.orders = CHANGE_FEEDS["orders"]
+        rows, self.cursor, has_more = self.orders.page()
+        self.assertEqual((len(rows), has_more), (3, False))
+
+    def changed(self):
+        rows, cursor, has_more = self.orders.page(self.cursor)
+        return sorted(row["order_reference"] for row in rows)
+
+    def test_nothing_changed(self):
+        self.assertEqual(self.orders.page(self.cursor), ([], self.cursor, False))
+
+    def test_write_paths(self):
+        order = SalesOrder.objects.get(pk="SO1")
+        order.save(update_fields=["customer"])
+        self.assertEqual(self.changed(), ["SO1"])
+        SalesOrder.objects.filter(pk="SO2").update(status="Draft")
+        SalesOrder.objects.bulk_update([SalesOrder.objects.get(pk="SO3")], ["status"])
+        self.assertEqual(self.changed(), ["SO1", "SO2", "SO3"])
+
+    def test_stale_timestamps_are_not_skipped(self):
+        # Rows committed after the cursor moved on, stamped with an earlier
+        # time, as a long transaction would leave them.
+        old = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+        SalesOrder.objects.filter(pk="SO2").update(updated_at=old)
+        self.assertEqual(self.changed(), ["SO2"])
+
+    def test_deletions(self):
+        _, self.cursor, _ = CHANGE_FEEDS["deletions"].page()
+        SalesOrder.objects.filter(pk="SO1").delete()
+        rows, _, _ = CHANGE_FEEDS["deletions"].page(self.cursor)
+        self.assertEqual([(row["kind"], row["object_pk"]) for row in rows], [("order", "SO1")])
+
+    def test_batches_stop_at_the_last_commit(self):
+        batches = self.orders.batches(batch_size=2)
+        references = [row["order_reference"] for row in next(batches)[0]]
+        OrderImporter().run([order_row("SO4")], [])
+        references += [row["order_reference"] for rows, cursor in batches for row in rows]
+        self.assertEqual(sorted(references), ["SO1", "SO2", "SO3"])
+
+    def test_timestamp_cursor_is_rejected(self):
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        cursor = encode_cursor([datetime.datetime(2025, 1, 6, tzinfo=datetime.timezone.utc), "SO1"])
+        response = self.client.get(reverse("api_changes"), {"kind": "orders", "after": cursor})
+        self.assertEqual(response.status_code, 400)
+
+
+class PdfFingerprintTests(TestCase):
+    """The PDF fingerprint covers what is printed, not the change tracking columns."""
+
+    def setUp(self):
+        OrderImporter().run([order_row("SO1")], [line_row("SO1", "a")])
+
+    def fingerprint(self):
+        order = SalesOrder.objects.get(pk="SO1")
+        return order_fingerprint(order, order.order_lines.order_by("pk"))
+
+    def test_touched_order_keeps_its_fingerprint(self):
+        fingerprint = self.fingerprint()
+        SalesOrder.objects.get(pk="SO1").save()
+        SalesOrderLines.objects.get(order_reference="SO1").save()
+        self.assertEqual(self.fingerprint(), fingerprint)
+
+    def test_changed_order_gets_a_new_fingerprint(self):
+        fingerprint = self.fingerprint()
+        SalesOrderLines.objects.filter(order_reference="SO1").update(product="b")
+        self.assertNotEqual(self.fingerprint(), fingerprint)
+
+
+class PdfCacheTests(TestCase):
+    """Order PDFs are rendered once per content and revalidated by ETag."""
+
+    def setUp(self):
+        pdf_cache().clear()
+        OrderImporter().run([order_row("SO1")], [line_row("SO1", "a")])
+        self.client.force_login(User.objects.create_superuser("admin"))
+
+    def get_pdf(self):
+        order = SalesOrder.objects.get(pk="SO1")
+        return get_order_pdf(order, order.order_lines.order_by("pk"))
+
+    @mock.patch("SalesOrders.pdf.render_order_pdf", return_value=b"%PDF")
+    def test_rendered_once(self, render):
+        self.assertEqual(self.get_pdf()[0], b"%PDF")
+        self.get_pdf()
+        self.assertEqual(render.call_count, 1)
+
+    @mock.patch("SalesOrders.pdf.render_order_pdf", return_value=b"%PDF")
+    def test_changed_order_is_rendered_again(self, render):
+        fingerprint = self.get_pdf()[1]
+        line = SalesOrderLines.objects.get(order_reference="SO1")
+        line.quantity = 2
+        line.save()
+        self.assertNotEqual(self.get_pdf()[1], fingerprint)
+        self.assertEqual(render.call_count, 2)
+
+    @mock.patch("SalesOrders.pdf.render_order_pdf", return_value=b"%PDF")
+    def test_revalidation(self, render):
+        url = reverse("admin:SalesOrders_salesorder_print_pdf", args=["SO1"])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(render.call_count, 1)
+
+
+class SearchTests(TestCase):
+    """Every search word has to match, as a text prefix, a date or an amount."""
+
+    def setUp(self):
+        OrderImporter().run(
+            [
+                order_row("SO1"),
+                (datetime.date(2025, 2, 3), "Beta Traders", "USD", "SO2", "Jane", "Draft", Decimal("1234.56")),
+                (datetime.date(2025, 2, 3), "Acme Ltd", "USD", "SO3", "Sam", "Draft", 100),
+            ],
+            [],
+        )
+
+    def search(self, term):
+        return sorted(search_orders(SalesOrder.objects.all(), term).values_list("pk", flat=True))
+
+    def test_text_prefixes(self):
+        self.assertEqual(self.search("acm"), ["SO1", "SO3"])
+        self.assertEqual(self.search("acme jane"), ["SO1"])
+        self.assertEqual(self.search('"beta traders"'), ["SO2"])
+        self.assertEqual(self.search("nobody"), [])
+
+    def test_dates_and_amounts(self):
+        self.assertEqual(self.search("2025-02-03"), ["SO2", "SO3"])
+        self.assertEqual(self.search("1,234.56"), ["SO2"])
+        self.assertEqual(self.search("100 acme"), ["SO1", "SO3"])
+
+    def test_index_follows_updates(self):
+        SalesOrder.objects.filter(pk="SO3").update(customer="Gamma Co")
+        self.assertEqual(self.search("gamma"), ["SO3"])
+        self.assertEqual(self.search("acme"), ["SO1"])
+
+    def test_changelist_search(self):
+        self.client.force_login(User.objects.create_superuser("admin"))
+        response = self.client.get(reverse("admin:SalesOrders_salesorder_changelist"), {"q": "beta"})
+        self.assertEqual([order.pk for order in response.context["cl"].result_list], ["SO2"])
+
+
+@mock.patch("SalesOrders.routers.replica_alias", return_value="replica")
+class ReadReplicaRouterTests(SimpleTestCase):
+    """Reads go to the replica only where asked, and only while it is reachable."""
+
+    def setUp(self):
+        self.addCleanup(replica_down_until.clear)
+
+    @mock.patch("SalesOrders.routers.replica_available", return_value=True)
+    def test_reads_in_read_replica_blocks(self, available, alias):
+        router = ReadReplicaRouter()
+        self.assertEqual(router.db_for_read(SalesOrder), DEFAULT_DB_ALIAS)
+        with read_replica():
+            self.assertEqual(router.db_for_read(SalesOrder), "replica")
+            self.assertEqual(router.db_for_read(Session), DEFAULT_DB_ALIAS)
+            self.assertEqual(router.db_for_write(SalesOrder), DEFAULT_DB_ALIAS)
+        self.assertEqual(router.db_for_read(SalesOrder), DEFAULT_DB_ALIAS)
+
+    @mock.patch("SalesOrders.routers.connections")
+    def test_unreachable_replica_falls_back(self, connections, alias):
+        connections.__getitem__.return_value.ensure_connection.side_effect = DatabaseError("down")
+        connections.__getitem__.return_value.in_atomic_block = False
+        with read_replica(), self.assertLogs("SalesOrders.routers", "WARNING"):
+            self.assertEqual(read_alias(), DEFAULT_DB_ALIAS)
+        # Not retried until REPLICA_RETRY_SECONDS have passed.
+        self.assertFalse(replica_available("replica"))
+        self.assertEqual(connections.__getitem__.return_value.ensure_connection.call_count, 1)
+
+    def test_replica_is_not_migrated(self, alias):
+        self.assertIs(ReadReplicaRouter().allow_migrate("replica", "SalesOrders"), False)
+        self.assertIsNone(ReadReplicaRouter().allow_migrate(DEFAULT_DB_ALIAS, "SalesOrders"))
+
+
+class ReadReplicaTransactionTests(TestCase):
+    """Inside a transaction reads stay on the primary, which has its writes."""
+
+    @mock.patch("SalesOrders.routers.replica_available", return_value=True)
+    @mock.patch("SalesOrders.routers.replica_alias", return_value="replica")
+    def test_transaction_reads_primary(self, alias, available):
+        with read_replica():
+            self.assertEqual(read_alias(), DEFAULT_DB_ALIAS)
+
+
+class OrderTotalsTests(TestCase):
+    """The stored line aggregates follow every write path to the lines."""
+
+    def setUp(self):
+        OrderImporter().run([order_row("SO1"), order_row("SO2")], [line_row("SO1", "a", 2), line_row("SO2", "b")])
+
+    def totals(self, order_reference):
+        order = SalesOrder.objects.get(pk=order_reference)
+        return order.line_count, order.lines_revenue, order.lines_margin
+
+    def test_imported_totals(self):
+        self.assertEqual(self.totals("SO1"), (1, Decimal("20.00"), Decimal("8.00")))
+
+    def test_save_and_delete(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            SalesOrderLines.objects.create(
+                order_reference_id="SO1", product="c", quantity=1, unit_price=5, cost=1
+            )
+        self.assertEqual(self.totals("SO1"), (2, Decimal("25.00"), Decimal("12.00")))
+        with self.captureOnCommitCallbacks(execute=True):
+            SalesOrderLines.objects.filter(product="c").delete()
+        self.assertEqual(self.totals("SO1"), (1, Decimal("20.00"), Decimal("8.00")))
+
+    def test_moved_lines_refresh_both_orders(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            SalesOrderLines.objects.filter(product="a").update(order_reference="SO2")
+        self.assertEqual(self.totals("SO1"), (0, Decimal("0.00"), Decimal("0.00")))
+        self.assertEqual(self.totals("SO2"), (2, Decimal("30.00"), Decimal("12.00")))
+
+    def test_bulk_create(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            SalesOrderLines.objects.bulk_create(
+                [SalesOrderLines(order_reference_id="SO2", product="d", quantity=3, unit_price=2, cost=1)]
+            )
+        self.assertEqual(self.totals("SO2"), (2, Decimal("16.00"), Decimal("7.00")))
+
+
+class ExportFormatTests(TestCase):
+    """The streamed CSV and ZIP exports read back as the same orders."""
+
+    def setUp(self):
+        OrderImporter().run(
+            [order_row("SO1")[:6] + (Decimal("1234.56"),), order_row("SO2")],
+            [line_row("SO1", "a", 3, Decimal("10.25"), Decimal("6.10")), line_row("SO2", "b")],
+        )
+        self.client.force_login(User.objects.create_superuser("admin"))
+
+    def download(self, export_format, name):
+        response = self.client.get(reverse("admin:SalesOrders_salesorder_export_orders"), {"format": export_format})
+        self.assertEqual(response.status_code, 200)
+        return File(io.BytesIO(b"".join(response.streaming_content)), name=name)
+
+    def assert_unchanged(self, source):
+        with source:
+            report = OrderImporter().run(source.order_rows(), source.line_rows())
+        self.assertEqual(report.errors, [])
+        self.assertEqual((report.orders_unchanged, report.lines_unchanged), (2, 2))
+
+    def test_zip(self):
+        self.assert_unchanged(SpreadsheetSource(self.download("zip", "export.zip")))
+
+    def test_csv(self):
+        orders = self.download("csv", "orders.csv")
+        lines = self.download("lines.csv", "lines.csv")
+        self.assert_unchanged(SpreadsheetSource(orders, lines))
+
+    def test_unknown_format(self):
+        response = self.client.get(reverse("admin:SalesOrders_salesorder_export_orders"), {"format": "pdf"})
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,184 @@
+import contextvars
+import json
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ContextDecorator, contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger("SalesOrders.performance")
+
+DUPLICATE_QUERY_THRESHOLD = 5
+PROFILE_INTERVAL = 0.005  # seconds between stack samples
+PROFILE_TOP_STACKS = 10
+
+current_timing = contextvars.ContextVar("salesorders_timing", default=None)
+
+
+class Timing:
+    """Query and section timings collected while one request or job runs."""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.duration = None
+        self.query_count = 0
+        self.sql_time = 0.0
+        self.statements = Counter()
+        self.sections = {}
+
+    def add_query(self, sql, elapsed):
+        self.query_count += 1
+        self.sql_time += elapsed
+        self.statements[sql] += 1
+
+    def add_section(self, name, elapsed):
+        self.sections[name] = self.sections.get(name, 0.0) + elapsed
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+        return self
+
+    def duplicate_queries(self, threshold=None):
+        """Statements run at least ``threshold`` times, the usual sign of an N+1 loop."""
+        if threshold is None:
+            threshold = getattr(settings, "SALESORDERS_DUPLICATE_QUERY_THRESHOLD", DUPLICATE_QUERY_THRESHOLD)
+        return [(sql, count) for sql, count in self.statements.most_common() if count >= threshold]
+
+    def server_timing(self):
+        """The value of a ``Server-Timing`` header, durations in milliseconds."""
+        metrics = [
+            f'total;dur={self.duration * 1000:.1f}',
+            f'db;dur={self.sql_time * 1000:.1f};desc="{self.query_count} queries"',
+        ]
+        duplicates = self.duplicate_queries()
+        if duplicates:
+            metrics.append(f'dup;desc="{sum(count for _, count in duplicates)} repeated queries"')
+        metrics += [f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in self.sections.items()]
+        return ", ".join(metrics)
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "duration_ms": round(self.duration * 1000, 1),
+            "queries": self.query_count,
+            "sql_ms": round(self.sql_time * 1000, 1),
+            "duplicate_queries": [
+                {"sql": sql[:300], "count": count} for sql, count in self.duplicate_queries()
+            ],
+            "sections_ms": {name: round(elapsed * 1000, 1) for name, elapsed in self.sections.items()},
+        }
+
+    def log(self, **extra):
+        logger.info(json.dumps({**self.as_dict(), **extra}, default=str))
+
+
+@contextmanager
+def collect(name):
+    """Collect timings for the code in the block; yields the ``Timing``."""
+    timing = Timing(name)
+    token = current_timing.set(timing)
+    try:
+        yield timing
+    finally:
+        timing.finish()
+        current_timing.reset(token)
+
+
+class section(ContextDecorator):
+    """
+    Add the time spent in a block (or decorated function) to a named section.
+
+    Costs a context variable lookup when no request or job is being timed.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.timing = current_timing.get()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.timing is not None:
+            self.timing.add_section(self.name, time.perf_counter() - self.started)
+        return False
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper, installed on every connection."""
+    timing = current_timing.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.add_query(sql, time.perf_counter() - started)
+
+
+def install_query_timing(sender, connection, **kwargs):
+    """``connection_created`` receiver adding ``record_query`` to new connections."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for slow requests.
+
+    A single daemon thread takes the stack of every registered thread every
+    ``interval`` seconds. Sampling instead of tracing keeps the cost on the
+    profiled code close to nothing, so it can stay on in production.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.samples = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self, thread_id):
+        with self.lock:
+            self.samples[thread_id] = Counter()
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="salesorders-profiler", daemon=True)
+                self.thread.start()
+
+    def stop(self, thread_id):
+        with self.lock:
+            return self.samples.pop(thread_id, Counter())
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self.lock:
+                for thread_id, counter in self.samples.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        counter[stack_summary(frame)] += 1
+
+
+def stack_summary(frame, depth=8):
+    """The innermost ``depth`` frames as ``file:line function`` entries, innermost first."""
+    entries = []
+    while frame is not None and len(entries) < depth:
+        code = frame.f_code
+        entries.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno} {code.co_name}")
+        frame = frame.f_back
+    return " < ".join(entries)
+
+
+def top_stacks(samples, interval=PROFILE_INTERVAL, limit=PROFILE_TOP_STACKS):
+    return [
+        {"stack": stack, "samples": count, "approx_ms": round(count * interval * 1000, 1)}
+        for stack, count in samples.most_common(limit)
+    ]
+
+
+profiler = SamplingProfiler()
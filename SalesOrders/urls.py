@@ -1,11 +1,24 @@
 from django.urls import path
 from django.contrib.auth.views import LogoutView
-from . import views
+from . import api, views
+from .executors import async_views_enabled
+
+# Served over ASGI, the orders list and API feed (like the admin downloads)
+# use their async versions, which hold no thread while waiting on the database
+# or the client.
+if async_views_enabled():
+    orders_view, orders_feed_view = views.sales_order_list_async, api.orders_feed_async
+else:
+    orders_view, orders_feed_view = views.sales_order_list, api.orders_feed
 
 urlpatterns = [
     path('', views.home, name='home'),
     # path("orders/", views.SalesOrder, name='SalesOrder')
     
-    path("orders/", views.sales_order_list, name="orders"),
+    path("orders/", orders_view, name="orders"),
+    path("dashboard/", views.sales_dashboard, name="dashboard"),
+    path("api/orders/", orders_feed_view, name="api_orders"),
+    path("api/changes/", api.changes_feed, name="api_changes"),
+    path("api/cache-stats/", api.page_cache_stats, name="api_cache_stats"),
     path("logout/", LogoutView.as_view(), name="logout")
 ]
\ No newline at end of file
@@ -1,7 +1,25 @@
+from asgiref.sync import sync_to_async
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db.models import Sum
 from django.shortcuts import render, HttpResponse
-from .models import SalesOrder
+from django.http import HttpResponseBadRequest
+from django.utils.dateparse import parse_date
+from .caching import cached_page
+from .models import CustomerRollup, SalesOrder, SalesRollup
+from .pagination import InvalidCursor, KeysetPaginator
+from .rollups import ROLLUP_MEASURES
+from .routers import read_replica
+
+# Columns shown by orders_list.html; nothing else is loaded.
+ORDER_LIST_FIELDS = [
+    "creation_date", "customer", "currency", "order_reference", "salesperson", "status", "total",
+]
+ORDER_LIST_PAGE_SIZES = (25, 50, 100, 200)
+DASHBOARD_TOP_CUSTOMERS = 20
+
 
 # Create your views here.
+@cached_page("home")
 def home(request):
     # return HttpResponse("Hello, world. You're at the home page.")
     return render(request, "home.html")
@@ -10,6 +28,131 @@ def home(request):
 #     order = SalesOrder.objects.all()
 #     return render(request, "SalesOrders.html", {"SalesOrder": order})
 
+def order_list_query(request):
+    """The filters, sort order, page size and paginator of an orders list request."""
+    orders = SalesOrder.objects.only(*ORDER_LIST_FIELDS)
+
+    filters = {
+        "status": request.GET.get("status", "").strip(),
+        "currency": request.GET.get("currency", "").strip(),
+        "salesperson": request.GET.get("salesperson", "").strip(),
+        "customer": request.GET.get("customer", "").strip(),
+    }
+    if filters["status"]:
+        orders = orders.filter(status=filters["status"])
+    if filters["currency"]:
+        orders = orders.filter(currency=filters["currency"])
+    if filters["salesperson"]:
+        orders = orders.filter(salesperson=filters["salesperson"])
+    if filters["customer"]:
+        orders = orders.filter(customer__istartswith=filters["customer"])
+
+    sort = "oldest" if request.GET.get("sort") == "oldest" else "newest"
+    try:
+        per_page = int(request.GET.get("per_page", 50))
+    except ValueError:
+        per_page = 50
+    if per_page not in ORDER_LIST_PAGE_SIZES:
+        per_page = 50
+
+    paginator = KeysetPaginator(
+        orders, keys=["creation_date", "order_reference"], per_page=per_page, descending=(sort == "newest")
+    )
+    return filters, sort, per_page, paginator
+
+
+def order_list_response(request, page, filters, sort, per_page):
+    # Query string without the cursor, for the pager links.
+    params = request.GET.copy()
+    for name in ("after", "before"):
+        params.pop(name, None)
+
+    return render(request, "orders_list.html", {
+        "orders": page,
+        "page": page,
+        "filters": filters,
+        "sort": sort,
+        "per_page": per_page,
+        "page_sizes": ORDER_LIST_PAGE_SIZES,
+        "base_query": params.urlencode(),
+    })
+
+
+# Read from the primary, not the replica: a page rendered from a lagging
+# replica just after a version bump would be cached as current.
+@cached_page("orders")
 def sales_order_list(request):
-    orders = SalesOrder.objects.all()
-    return render(request, "orders_list.html", {"orders": orders})
+    filters, sort, per_page, paginator = order_list_query(request)
+    try:
+        page = paginator.page(after=request.GET.get("after"), before=request.GET.get("before"))
+    except InvalidCursor:
+        return HttpResponseBadRequest("Invalid page cursor.")
+    return order_list_response(request, page, filters, sort, per_page)
+
+
+@cached_page("orders")
+async def sales_order_list_async(request):
+    """``sales_order_list`` for ASGI: the page is fetched through the async ORM."""
+    filters, sort, per_page, paginator = order_list_query(request)
+    try:
+        page = await paginator.apage(after=request.GET.get("after"), before=request.GET.get("before"))
+    except InvalidCursor:
+        return HttpResponseBadRequest("Invalid page cursor.")
+    # Rendered in a thread: context processors may still query the database.
+    return await sync_to_async(order_list_response)(request, page, filters, sort, per_page)
+
+
+def parse_month(value):
+    try:
+        return parse_date(f"{value}-01") if value else None
+    except ValueError:
+        return None
+
+
+def rollup_totals(rollups, dimension, order_by, limit=None):
+    rows = rollups.values(dimension).annotate(**{name: Sum(name) for name in ROLLUP_MEASURES}).order_by(order_by)
+    rows = list(rows[:limit] if limit else rows)
+    for row in rows:
+        row["label"] = row[dimension]
+        row["margin_percentage"] = row["margin"] * 100 / row["revenue"] if row["revenue"] else None
+    return rows
+
+
+@staff_member_required
+@read_replica()
+def sales_dashboard(request):
+    """
+    Revenue and margin by month, salesperson, customer and status.
+
+    Reads only the monthly rollups, never the orders themselves, so it costs
+    the same whatever the size of the order tables. Amounts are never summed
+    across currencies: one currency is shown at a time.
+    """
+    currencies = list(
+        SalesRollup.objects.values_list("currency", flat=True).order_by("currency").distinct()
+    )
+    currency = request.GET.get("currency") or (currencies[0] if currencies else "")
+    date_from = parse_month(request.GET.get("from"))
+    date_to = parse_month(request.GET.get("to"))
+
+    def selected(model):
+        rollups = model.objects.filter(currency=currency)
+        if date_from:
+            rollups = rollups.filter(period__gte=date_from)
+        if date_to:
+            rollups = rollups.filter(period__lte=date_to)
+        return rollups
+
+    rollups = selected(SalesRollup)
+
+    return render(request, "dashboard.html", {
+        "currency": currency,
+        "currencies": currencies,
+        "date_from": date_from,
+        "date_to": date_to,
+        "totals": rollups.aggregate(**{name: Sum(name) for name in ROLLUP_MEASURES}),
+        "by_month": rollup_totals(rollups, "period", "-period"),
+        "by_salesperson": rollup_totals(rollups, "salesperson", "-revenue"),
+        "by_customer": rollup_totals(selected(CustomerRollup), "customer", "-revenue", DASHBOARD_TOP_CUSTOMERS),
+        "by_status": rollup_totals(rollups, "status", "-revenue"),
+    })